@@ -0,0 +1,84 @@
+"""Micro-benchmark: eBay product extraction, per-field select_one vs the compiled single-pass extractor.
+
+Run from the repository root:
+    python benchmarks/ebay_extract.py
+"""
+import glob
+import os
+import re
+import sys
+import time
+from contextlib import redirect_stdout
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The repository root too: the eBay modules import scraper_core
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'ebay_scrape'))
+
+from parsing import parse_ebay_page  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures', 'ebay', '*.html')
+
+
+def select_one_extract(content, parser):
+    """The original extraction loop from scrape_ebay_data, kept as the baseline."""
+    data = []
+    soup = BeautifulSoup(content, parser)
+    if not soup.title or "eBay" not in soup.title.text:
+        return data
+    for container in soup.select(".s-item__wrapper"):
+        product = dict.fromkeys(['PRODUCT NAME', 'PRICE', 'CONDITION', 'SELLER',
+                                 'SELLER RATING', 'RATING COUNT', 'SELLER LOCATION', 'URL'])
+        try:
+            name = container.select_one(".s-item__title").text.strip()
+            product['PRODUCT NAME'] = re.sub(r'^New Listing\s*', '', name)
+            product['PRICE'] = container.select_one(".s-item__price").text.strip()
+        except AttributeError:
+            continue
+        try:
+            product['CONDITION'] = container.select_one(".SECONDARY_INFO").text.strip()
+        except AttributeError:
+            pass
+        seller_info = container.select_one(".s-item__seller-info-text")
+        if seller_info:
+            match = re.search(r'(.+?)\s*\((\d+)\)\s*(\S+)', seller_info.text.strip())
+            if match:
+                product['SELLER'] = match.group(1).strip()
+                product['RATING COUNT'] = match.group(2).strip()
+                product['SELLER RATING'] = match.group(3).strip()
+        try:
+            product['SELLER LOCATION'] = container.select_one(".s-item__location.s-item__itemLocation").text.strip()
+        except AttributeError:
+            pass
+        link_element = container.select_one(".s-item__link")
+        if link_element and link_element.has_attr("href"):
+            product['URL'] = link_element["href"].split("?")[0]
+        if all(value not in [None, "", "N/A"] for value in product.values()):
+            data.append(product)
+    return data
+
+
+def bench(label, extract, pages, rounds):
+    items = 0
+    start = time.perf_counter()
+    with redirect_stdout(open(os.devnull, 'w')):
+        for _ in range(rounds):
+            for content in pages:
+                items += len(extract(content))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {items / elapsed:>10.0f} items/sec")
+    return items / elapsed
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    pages = [open(path, 'rb').read() for path in sorted(glob.glob(FIXTURES))]
+    print(f"{len(pages)} fixture pages, {rounds} rounds")
+
+    baseline = bench("select_one + html.parser (before)", lambda c: select_one_extract(c, 'html.parser'), pages, rounds)
+    bench("select_one + lxml", lambda c: select_one_extract(c, 'lxml'), pages, rounds)
+    bench("single pass + html.parser", lambda c: parse_ebay_page(c, 'html.parser')[0], pages, rounds)
+    after = bench("single pass + lxml XPath (after)", lambda c: parse_ebay_page(c, 'lxml')[0], pages, rounds)
+    print(f"speedup: {after / baseline:.1f}x")
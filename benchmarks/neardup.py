@@ -0,0 +1,66 @@
+"""Near-duplicate detection on a million rows built from the committed eBay CSV.
+
+Run from the repository root:
+    python benchmarks/neardup.py
+    python benchmarks/neardup.py --rows 200000
+
+Every repeated title gets a distinct item number appended, so rows are
+similar without being identical. Times the bulk load of stored data, the
+batch mode used to clean a CSV, and per-record lookups against the loaded
+index, compared with checking a record against every stored signature.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from scraper_core.neardup import NearDuplicateIndex  # noqa: E402
+
+SOURCE = os.path.join(ROOT, 'ebay_scrape', 'ebay_data.csv')
+
+
+def similar_rows(rows, seed=0):
+    df = pd.read_csv(SOURCE, dtype=str, keep_default_na=False, na_values=[""])
+    df = df.iloc[np.arange(rows) % len(df)].reset_index(drop=True)
+    item_numbers = pd.Series(np.random.default_rng(seed).integers(0, 10 ** 9, rows)).astype(str)
+    df['PRODUCT NAME'] = df['PRODUCT NAME'] + " #" + item_numbers
+    return df
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def brute_force(index, records):
+    """The lookup without LSH: compare with every stored signature."""
+    stored = index.signatures[:index.count]
+    for record in records:
+        signature = index.hasher.signatures([index._text(record)])[0]
+        (stored == signature).mean(axis=1) >= index.threshold
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark scraper_core.neardup")
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    arg_parser.add_argument('--lookups', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    df = similar_rows(args.rows)
+    # Lookups use titles the loaded rows do not contain exactly
+    lookups = similar_rows(args.lookups, seed=1).to_dict('records')
+    index = NearDuplicateIndex('ebay')
+    print(f"{'case':<22} {'count':>9} {'seconds':>8} {'per second':>12}")
+    for case, count, seconds in (
+        ('bulk load (extend)', len(df), timed(index.extend, df)),
+        ('batch (duplicates)', len(df), timed(NearDuplicateIndex('ebay').duplicates, df)),
+        ('lookup (find)', len(lookups), timed(lambda: [index.find(record) for record in lookups])),
+        ('lookup, brute force', 100, timed(brute_force, index, lookups[:100])),
+    ):
+        print(f"{case:<22} {count:>9} {seconds:>8.2f} {count / seconds:>12,.0f}")
@@ -0,0 +1,99 @@
+"""Normalization throughput on a million rows built from the committed CSVs.
+
+Run from the repository root:
+    python benchmarks/normalize.py
+    python benchmarks/normalize.py --rows 5000000
+
+Two cases per dataset: the real rows repeated (scraped columns repeat a lot,
+which the parse-each-distinct-value-once approach relies on) and every price
+made distinct, the worst case. Each case is also timed with the baseline it
+replaces, a per-row regex loop producing the same typed columns.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from scraper_core.normalize import (COUNT, COUNT_SUFFIXES, CURRENCIES, DATASETS, NUMBER,  # noqa: E402
+                                    PRICE_RANGE, normalize)
+
+SOURCES = {
+    'ebay': os.path.join(ROOT, 'ebay_scrape', 'ebay_data.csv'),
+    'zomato_details': os.path.join(ROOT, 'zomato_scrape', 'zomato_data.csv'),
+}
+PRICE_COLUMNS = {'ebay': 'PRICE', 'zomato_details': 'price'}
+
+
+def repeated_rows(dataset, rows):
+    df = pd.read_csv(SOURCES[dataset], dtype=str, keep_default_na=False, na_values=[""])
+    df = df[[column for column in DATASETS[dataset] if column in df.columns]]
+    return df.iloc[np.arange(rows) % len(df)].reset_index(drop=True)
+
+
+def distinct_prices(df, dataset):
+    df = df.copy()
+    df[PRICE_COLUMNS[dataset]] = "$" + pd.Series(np.arange(len(df)) / 100, dtype="float64").map("{:.2f}".format)
+    return df
+
+
+def _number(text):
+    return float(text.replace(',', ''))
+
+
+def _price(match):
+    low = _number(match['low'])
+    symbol = match['currency'].strip() if match['currency'] else None
+    return low, _number(match['high']) if match['high'] else low, CURRENCIES.get(symbol, symbol)
+
+
+def _count(match):
+    return round(_number(match['number']) * COUNT_SUFFIXES.get(match['suffix'], 1.0))
+
+
+ROW_PARSERS = {
+    'price': (re.compile(PRICE_RANGE), _price, (None, None, None)),
+    'number': (re.compile(NUMBER), lambda match: (_number(match['number']),), (None,)),
+    'count': (re.compile(COUNT), lambda match: (_count(match),), (None,)),
+}
+
+
+def per_row_normalize(df, spec):
+    """What the scrapers would otherwise do: one regex match per row and column, for the same typed columns."""
+    df = df.copy()
+    for column, (kind, outputs) in spec.items():
+        if column not in df.columns:
+            continue
+        pattern, convert, missing = ROW_PARSERS[kind]
+        rows = []
+        for text in df[column]:
+            match = pattern.search(text) if isinstance(text, str) else None
+            rows.append(convert(match) if match else missing)
+        for output, values in zip(outputs, zip(*rows)):
+            df[output] = values
+    return df
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark scraper_core.normalize")
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    args = arg_parser.parse_args()
+
+    print(f"{'dataset':<16} {'case':<10} {'rows':>9} {'per-row s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for dataset in SOURCES:
+        repeated = repeated_rows(dataset, args.rows)
+        for case, df in (('repeated', repeated), ('distinct', distinct_prices(repeated, dataset))):
+            before = timed(per_row_normalize, df, DATASETS[dataset])
+            after = timed(normalize, df, DATASETS[dataset])
+            print(f"{dataset:<16} {case:<10} {len(df):>9} {before:>10.2f} {after:>13.2f} {before / after:>7.1f}x")
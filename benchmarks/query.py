@@ -0,0 +1,76 @@
+"""Indexed queries against a full pandas scan, on a million-row CSV built from the committed eBay data.
+
+Run from the repository root:
+    python benchmarks/query.py
+    python benchmarks/query.py --rows 200000
+
+The CSV is written to a temporary directory and indexed from scratch;
+then a batch of rows is appended, as the scraper does, and the index is
+reopened, which only parses the new rows. Each query is timed through the
+index and as the load-and-filter with pandas it replaces.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from scraper_core.normalize import DATASETS, normalize  # noqa: E402
+from scraper_core.query import QueryIndex  # noqa: E402
+
+SOURCE = os.path.join(ROOT, 'ebay_scrape', 'ebay_data.csv')
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def pandas_queries(csv_filename):
+    """The same questions asked the way consumers do today: load the CSV, then filter."""
+    df = pd.read_csv(csv_filename)
+    location = df['SELLER LOCATION'].str.lower().str.replace('from ', '', regex=False)
+    cheap_new = df[(df['PRICE MIN'] <= 50) & (df['CONDITION'].str.lower() == 'brand new')]
+    cheap_new.nlargest(10, 'RATING COUNT VALUE')
+    df[df['PRICE MIN'] >= 100].groupby(location)['PRICE MIN'].agg(['count', 'mean'])
+    df[location.isin(['china', 'japan']) & df['PRICE MIN'].between(10, 50)]
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark scraper_core.query")
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    arg_parser.add_argument('--append', type=int, default=200, help="rows appended before reopening")
+    args = arg_parser.parse_args()
+
+    source = normalize(pd.read_csv(SOURCE, dtype=str), DATASETS['ebay'])
+    with tempfile.TemporaryDirectory() as directory:
+        csv_filename = os.path.join(directory, 'ebay_data.csv')
+        source.iloc[np.arange(args.rows) % len(source)].to_csv(csv_filename, index=False)
+
+        print(f"{'step':<34} {'ms':>10}")
+        seconds, index = timed(QueryIndex, csv_filename, 'ebay')
+        print(f"{'build index (' + str(len(index)) + ' rows)':<34} {seconds * 1000:>10.1f}")
+        seconds, index = timed(QueryIndex, csv_filename, 'ebay')
+        print(f"{'open (memory-mapped)':<34} {seconds * 1000:>10.1f}")
+        source.iloc[:args.append].to_csv(csv_filename, mode='a', header=False, index=False)
+        seconds, index = timed(QueryIndex, csv_filename, 'ebay')
+        print(f"{'open after appending ' + str(args.append) + ' rows':<34} {seconds * 1000:>10.1f}")
+
+        for name, query in (
+            ('top 10 by ratings, <= $50, new', lambda: index.top('ratings', 10, {'price': (None, 50),
+                                                                                  'condition': 'brand new'})),
+            ('group by location, >= $100', lambda: index.group('location', {'price': (100, None)}, 'price', 'mean')),
+            ('china|japan, $10-50', lambda: index.select({'location': ['china', 'japan'], 'price': (10, 50)})),
+            ('top 10 by price', lambda: index.top('price', 10)),
+            ('read 100 matching rows', lambda: index.rows(index.select({'seller': 'xiangqistore'})[:100])),
+        ):
+            seconds, _ = timed(query)
+            print(f"{name:<34} {seconds * 1000:>10.1f}")
+        seconds, _ = timed(pandas_queries, csv_filename)
+        print(f"{'pandas: load + first three queries':<34} {seconds * 1000:>10.1f}")
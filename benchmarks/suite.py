@@ -0,0 +1,327 @@
+"""Offline benchmark suite: every scraper against recorded fixture pages, no network needed.
+
+Run from the repository root:
+    python benchmarks/suite.py                           # every scenario
+    python benchmarks/suite.py ebay_parse timesjobs_parse --rounds 20
+    python benchmarks/suite.py --save before.json
+    python benchmarks/suite.py --compare before.json     # exit status 1 on a regression
+
+Each scenario runs in a child process of its own so its peak RSS is not
+shared with the others. Scenarios that fetch pages (plain HTTP or Selenium)
+get them from a local HTTP server over benchmarks/fixtures; Selenium
+scenarios are skipped when no Chrome can be started.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT)
+
+
+class SkipScenario(Exception):
+    pass
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Serves benchmarks/fixtures on a free localhost port for the duration of a `with` block."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=FIXTURES))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}/{os.path.relpath(path, FIXTURES).replace(os.sep, '/')}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def fixture_paths(site):
+    return sorted(glob.glob(os.path.join(FIXTURES, site, '*.html')))
+
+
+def run_pages(pages, process, rounds):
+    """Call `process(page)` (which returns a record count) for every page, `rounds` times.
+
+    Returns (per-page latencies, records, elapsed seconds); setup outside this loop is not timed.
+    """
+    latencies = []
+    records = 0
+    with redirect_stdout(open(os.devnull, 'w')):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                page_started = time.perf_counter()
+                records += process(page)
+                latencies.append(time.perf_counter() - page_started)
+        elapsed = time.perf_counter() - started
+    return latencies, records, elapsed
+
+
+# Scenarios: each takes the round count and returns run_pages' result
+
+def ebay_parse(rounds):
+    sys.path.insert(0, os.path.join(ROOT, 'ebay_scrape'))
+    from parsing import parse_ebay_page
+    pages = [open(path, 'rb').read() for path in fixture_paths('ebay')]
+    return run_pages(pages, lambda content: len(parse_ebay_page(content)[0]), rounds)
+
+
+def ebay_item_parse(rounds):
+    sys.path.insert(0, os.path.join(ROOT, 'ebay_scrape'))
+    from parsing import parse_item_page
+    # Item ids come from the URL, so any /itm/ URL will do
+    pages = [open(path, 'rb').read() for path in fixture_paths('ebay_item')]
+    return run_pages(pages, lambda content: len(parse_item_page("https://www.ebay.com/itm/1", content, {})[0]), rounds)
+
+
+def ebay_fetch(rounds):
+    """The crawl's own path: Frontier -> PageFetcher -> Pipeline(EbaySite), parsing in worker processes.
+
+    Every fixture page is queued `rounds` times (under distinct query
+    strings, which the fixture server ignores) and crawled in one pipeline
+    run, so worker processes start once as in a real crawl. Latencies are
+    the times between finished pages.
+    """
+    sys.path.insert(0, os.path.join(ROOT, 'ebay_scrape'))
+    from ebay_site import EbaySite, looks_blocked
+    from frontier import Frontier
+    from scraper_core.fetcher import PageFetcher, random_headers
+    from scraper_core.pipeline import Pipeline
+    # A high starting rate, so the limiter measures its overhead rather than its politeness
+    fetcher = PageFetcher(random_headers, rate=1000, burst=1000, is_blocked=looks_blocked)
+    latencies = []
+    records = 0
+    with fetcher, FixtureServer() as server, tempfile.TemporaryDirectory() as directory:
+        frontier = Frontier(os.path.join(directory, 'frontier.sqlite'))
+        for round_number in range(rounds):
+            for path in fixture_paths('ebay'):
+                frontier.add(f"{server.url(path)}?round={round_number}")
+        pipeline = Pipeline(EbaySite(frontier), fetcher, parse_workers=os.cpu_count())
+        with redirect_stdout(open(os.devnull, 'w')):
+            started = page_started = time.perf_counter()
+            for _, new in pipeline.run():
+                records += len(new)
+                latencies.append(time.perf_counter() - page_started)
+                page_started = time.perf_counter()
+            elapsed = time.perf_counter() - started
+        frontier.close()
+    return latencies, records, elapsed
+
+
+def zomato_detail_parse(rounds):
+    sys.path.insert(0, os.path.join(ROOT, 'zomato_scrape'))
+    from details import parse_detail_html
+    pages = [open(path, 'rb').read() for path in fixture_paths('zomato')]
+    return run_pages(pages, lambda content: int(parse_detail_html(content, '')[0]['name'] is not None), rounds)
+
+
+def zomato_detail_http(rounds):
+    sys.path.insert(0, os.path.join(ROOT, 'zomato_scrape'))
+    from details import HEADERS, parse_detail_html
+    from scraper_core.fetcher import PageFetcher
+    fetcher = PageFetcher(lambda: HEADERS, rate=1000, burst=1000, block_statuses=(403,), max_attempts=1)
+    with fetcher, FixtureServer() as server:
+        urls = [server.url(path) for path in fixture_paths('zomato')]
+        return run_pages(urls, lambda url: int(not parse_detail_html(fetcher.fetch(url), url)[1]), rounds)
+
+
+def zomato_detail_selenium(rounds):
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.chrome.service import Service
+
+    sys.path.insert(0, os.path.join(ROOT, 'zomato_scrape'))
+    from details import parse_detail_html
+    from scraper_core.browser import load_page
+    from zomato_site import DETAIL_READY
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    try:
+        # CHROMEDRIVER avoids Selenium Manager, which may need the network to resolve a driver
+        service = Service(os.environ['CHROMEDRIVER']) if os.environ.get('CHROMEDRIVER') else Service()
+        driver = webdriver.Chrome(service=service, options=options)
+    except WebDriverException as e:
+        raise SkipScenario(f"no Chrome available ({e.msg.splitlines()[0] if e.msg else type(e).__name__})")
+
+    def scrape(url):
+        return int(not parse_detail_html(load_page(driver, url, DETAIL_READY), url)[1])
+
+    try:
+        with FixtureServer() as server:
+            urls = [server.url(path) for path in fixture_paths('zomato')]
+            return run_pages(urls, scrape, rounds)
+    finally:
+        driver.quit()
+
+
+def timesjobs_parse(rounds):
+    sys.path.insert(0, os.path.join(ROOT, 'job_scraping'))
+    from parsing import JobExtractor
+    extractor = JobExtractor()
+    pages = [open(path, 'rb').read() for path in fixture_paths('timesjobs')]
+    return run_pages(pages, lambda content: len(extractor.extract(content)[0]), rounds)
+
+
+SCENARIOS = {
+    'ebay_parse': ebay_parse,
+    'ebay_item_parse': ebay_item_parse,
+    'ebay_fetch': ebay_fetch,
+    'zomato_detail_parse': zomato_detail_parse,
+    'zomato_detail_http': zomato_detail_http,
+    'zomato_detail_selenium': zomato_detail_selenium,
+    'timesjobs_parse': timesjobs_parse,
+}
+
+# Metrics --compare checks: which direction is better, and a multiplier on
+# --tolerance for the noisier ones (p99 is close to the single slowest page)
+METRICS = {
+    'pages_per_sec': ('higher', 1),
+    'records_per_sec': ('higher', 1),
+    'p50_ms': ('lower', 1),
+    'p99_ms': ('lower', 2),
+    'peak_rss_mb': ('lower', 1),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(name, rounds):
+    try:
+        latencies, records, elapsed = SCENARIOS[name](rounds)
+    except SkipScenario as e:
+        return {'scenario': name, 'skipped': str(e)}
+    return {
+        'scenario': name,
+        'pages': len(latencies),
+        'records': records,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(len(latencies) / elapsed, 1),
+        'records_per_sec': round(records / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource else None,
+    }
+
+
+def run_in_child(name, rounds, repeat):
+    """Run `name` in `repeat` fresh processes and keep the fastest run, which is the least disturbed by noise."""
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name, '--rounds', str(rounds)],
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        if completed.returncode != 0:
+            return {'scenario': name, 'error': completed.stderr.strip().splitlines()[-1]}
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        if 'pages' not in result:
+            return result
+        if best is None or result['pages_per_sec'] > best['pages_per_sec']:
+            best = result
+    return best
+
+
+def print_results(results):
+    print(f"{'scenario':<24} {'pages/s':>9} {'records/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8}")
+    for result in results:
+        if 'pages' not in result:
+            reason = f"skipped: {result['skipped']}" if 'skipped' in result else f"error: {result['error']}"
+            print(f"{result['scenario']:<24} {reason}")
+            continue
+        print(f"{result['scenario']:<24} {result['pages_per_sec']:>9} {result['records_per_sec']:>10} "
+              f"{result['p50_ms']:>8} {result['p99_ms']:>8} {result['peak_rss_mb'] or '-':>8}")
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every metric against `baseline`; return the regressions found."""
+    before = {result['scenario']: result for result in baseline['results'] if 'pages' in result}
+    regressions = []
+    print(f"\nCompared with {baseline['label']} (tolerance {tolerance:.0%}):")
+    for result in results:
+        old = before.get(result['scenario'])
+        if old is None or 'pages' not in result:
+            continue
+        for metric, (better, slack) in METRICS.items():
+            if not old.get(metric) or result.get(metric) is None:
+                continue
+            change = result[metric] / old[metric] - 1
+            worse = -change if better == 'higher' else change
+            flag = "  REGRESSION" if worse > tolerance * slack else ""
+            if flag:
+                regressions.append((result['scenario'], metric))
+            print(f"  {result['scenario']:<24} {metric:<16} {old[metric]:>10} -> {result[metric]:>10} "
+                  f"({change:+.1%}){flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Offline scraper benchmarks")
+    arg_parser.add_argument('scenarios', nargs='*', help=f"scenarios to run (default: all): {', '.join(SCENARIOS)}")
+    arg_parser.add_argument('--rounds', type=int, default=20, help="passes over the fixture pages")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per scenario; the fastest is reported")
+    arg_parser.add_argument('--save', help="write the results to this JSON file")
+    arg_parser.add_argument('--compare', help="JSON file from an earlier --save to check for regressions")
+    arg_parser.add_argument('--tolerance', type=float, default=0.15,
+                            help="relative change allowed before a metric counts as a regression")
+    arg_parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    unknown = [name for name in args.scenarios + [args.child or 'ebay_parse'] if name not in SCENARIOS]
+    if unknown:
+        arg_parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.rounds)))
+        sys.exit()
+
+    results = [run_in_child(name, args.rounds, args.repeat) for name in args.scenarios or SCENARIOS]
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'label': args.save, 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'rounds': args.rounds, 'repeat': args.repeat, 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+
+ITEM_ID = re.compile(r'/itm/(?:[^/?]+/)?(\d+)')
+
+
+def item_id(url):
+    match = ITEM_ID.search(url or "")
+    return match.group(1) if match else None
+
+
+def _digest(*parts):
+    return hashlib.blake2b("\x1f".join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class KeyIndex:
+    """Persistent hashed index of the records already stored in a sink.
+
+    Each stored row contributes two keys: its eBay item id (parsed from URL)
+    and its (PRODUCT NAME, PRICE) pair; a record is a duplicate if either key
+    was seen before. Keys live in memory as sets and, once their records are
+    stored, are appended to a sidecar file next to the data, so later runs
+    load them without reading the dataset. The sidecar is rebuilt from the
+    sink's key columns whenever it is missing or older than the data.
+
+    When several crawls share the data (see SharedSink), open, `catch_up`,
+    `persist` and `close` must run under their lock: `catch_up` reads the
+    keys the others appended since, and remembers them in `foreign`.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.index_filename = sink.path.rstrip(os.sep) + '.keys'
+        self.ids = set()
+        self.name_prices = set()
+        self.foreign = set()  # keys stored by other processes since this index was opened
+        self.count = 0
+        self._load()
+        self._file = open(self.index_filename, 'a', encoding='utf-8')
+        self.offset = os.fstat(self._file.fileno()).st_size
+
+    def _is_stale(self):
+        last_modified = self.sink.last_modified()
+        if not os.path.exists(self.index_filename):
+            return bool(last_modified)
+        return not last_modified or os.path.getmtime(self.index_filename) < last_modified
+
+    def _load(self):
+        if self._is_stale():
+            self._rebuild()
+            return
+        if not os.path.exists(self.index_filename):
+            return
+        with open(self.index_filename, encoding='utf-8') as f:
+            for line in f:
+                id_key, name_price_key = line.split()
+                self._remember(id_key, name_price_key)
+
+    def _rebuild(self):
+        keys = self.sink.read_columns(['PRODUCT NAME', 'PRICE', 'URL'])
+        with open(self.index_filename, 'w', encoding='utf-8') as f:
+            for name, price, url in keys.itertuples(index=False):
+                id_key, name_price_key = self._keys({'PRODUCT NAME': name, 'PRICE': price, 'URL': url})
+                self._remember(id_key, name_price_key)
+                f.write(f"{id_key} {name_price_key}\n")
+
+    def _keys(self, record):
+        name_price_key = _digest(str(record['PRODUCT NAME']), str(record['PRICE']))
+        # Records without a parseable item id fall back to the name/price key
+        id_key = item_id(record.get('URL')) or name_price_key
+        return id_key, name_price_key
+
+    def _remember(self, id_key, name_price_key):
+        self.ids.add(id_key)
+        self.name_prices.add(name_price_key)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, record):
+        id_key, name_price_key = self._keys(record)
+        return id_key in self.ids or name_price_key in self.name_prices
+
+    def add(self, record):
+        """Index `record` in memory and return True, or return False if it duplicates a known record."""
+        id_key, name_price_key = self._keys(record)
+        if id_key in self.ids or name_price_key in self.name_prices:
+            return False
+        self._remember(id_key, name_price_key)
+        return True
+
+    def catch_up(self):
+        """Remember the keys other processes appended to the sidecar since this index last read or wrote it."""
+        with open(self.index_filename, 'rb') as f:
+            f.seek(self.offset)
+            appended = f.read()
+        # A line cut short by a crashed writer is left alone
+        end = appended.rfind(b"\n") + 1
+        for line in appended[:end].decode('utf-8').splitlines():
+            id_key, name_price_key = line.split()
+            self._remember(id_key, name_price_key)
+            self.foreign.update((id_key, name_price_key))
+        self.offset += end
+
+    def stored_elsewhere(self, records):
+        """Split off the `records` another process stored after `add` accepted them here."""
+        if not self.foreign:
+            return records, []
+        kept, dropped = [], []
+        for record in records:
+            (dropped if any(key in self.foreign for key in self._keys(record)) else kept).append(record)
+        self.count -= len(dropped)
+        return kept, dropped
+
+    def persist(self, records):
+        """Append the keys of `records` to the sidecar; call once they are stored in the sink."""
+        for record in records:
+            id_key, name_price_key = self._keys(record)
+            self._file.write(f"{id_key} {name_price_key}\n")
+        self._file.flush()
+        self.offset = os.fstat(self._file.fileno()).st_size
+
+    def close(self):
+        self._file.close()
+        # Mark the index as current with respect to the data written before closing
+        os.utime(self.index_filename)
+
+
+class SharedSink:
+    """Sink wrapper that lets several crawl processes store one dataset, deduplicated by `key_index`.
+
+    Every write holds `lock` (a scraper_core.sinks.FileLock next to the
+    data): the key index catches up with the keys the other crawls stored,
+    records one of them stored first are dropped, and the rest are written
+    together with their keys, so the data and the sidecar always agree.
+    Reads, compaction and exports hold the lock as well.
+    """
+
+    def __init__(self, sink, key_index, lock):
+        self.sink = sink
+        self.key_index = key_index
+        self.lock = lock
+        self.dropped = 0
+
+    @property
+    def path(self):
+        return self.sink.path
+
+    def write(self, records):
+        with self.lock:
+            self.key_index.catch_up()
+            records, dropped = self.key_index.stored_elsewhere(records)
+            self.dropped += len(dropped)
+            if records:
+                self.sink.refresh()
+                self.sink.write(records)
+                self.key_index.persist(records)
+
+    def read_columns(self, columns=None):
+        with self.lock:
+            self.sink.refresh()
+            return self.sink.read_columns(columns)
+
+    def last_modified(self):
+        return self.sink.last_modified()
+
+    def compact(self):
+        with self.lock:
+            self.sink.compact()
+
+    def export_csv(self, csv_filename):
+        with self.lock:
+            self.sink.refresh()
+            self.sink.export_csv(csv_filename)
+
+    def close(self):
+        self.sink.close()
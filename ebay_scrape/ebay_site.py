@@ -0,0 +1,55 @@
+import re
+from functools import partial
+from urllib.parse import urlencode
+
+from scraper_core.pipeline import Site
+from parsing import parse_search_page
+
+SEARCH_URL = "https://www.ebay.com/sch/i.html"
+PAGE_TITLE = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+def looks_blocked(content):
+    """eBay serves its bot wall ("Pardon Our Interruption") with a 200; real pages have eBay in the title."""
+    match = PAGE_TITLE.search(content)
+    return match is None or b'eBay' not in match.group(1)
+
+
+def search_page_urls(query, start_page=1, max_pages=100):
+    """Generate `_pgn=` search result URLs up front instead of following `pagination__next`."""
+    for page in range(start_page, start_page + max_pages):
+        yield f"{SEARCH_URL}?{urlencode({'_nkw': query, '_sacat': 0, '_pgn': page})}"
+
+
+class EbaySite(Site):
+    """eBay search results, crawled from the search pages queued in a Frontier.
+
+    Pages are parsed by `parse_search_page` with the given HTML `parser`,
+    which is picklable so it can run in worker processes. A page that fails
+    to download or parse is queued again, and its copy is dropped from
+    `cache` so the retry fetches it anew.
+    """
+
+    def __init__(self, frontier, parser='lxml', offline=False, cache=None):
+        self.frontier = frontier
+        self.offline = offline
+        self.cache = cache
+        self.parse = partial(parse_search_page, parser=parser)
+
+    def urls(self):
+        # Claim pages one at a time, so pages left unclaimed stay queued for the next run
+        while True:
+            page_url = self.frontier.claim()
+            if page_url is None:
+                return
+            yield page_url
+
+    def page_done(self, url, records, more):
+        self.frontier.done(url, records=len(records), last=not more)
+
+    def page_failed(self, url):
+        # Offline misses stay leased and are handed back by frontier.release()
+        if not self.offline:
+            if self.cache is not None:
+                self.cache.delete(url)
+            self.frontier.failed(url)
@@ -0,0 +1,209 @@
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from scraper_core.metrics import metrics
+from scraper_core.pipeline import Pipeline, Site
+from dedup import item_id
+from parsing import ITEM_COLUMNS, parse_item_page
+
+ITEM_URL = "https://www.ebay.com/itm/{}"
+DETAIL_COLUMNS = ITEM_COLUMNS + ['ENRICHED AT']
+
+_DONE = object()
+
+
+class DetailStore:
+    """Item page details by eBay item id, with the time they were fetched, in SQLite.
+
+    It is the sink of the enrichment pipeline and remembers which ids were
+    enriched recently across runs; `merge_into` joins the details onto the
+    stored search records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS items (item_id TEXT PRIMARY KEY, enriched_at REAL NOT NULL, details TEXT)"
+        )
+
+    def recent(self, item_ids, max_age):
+        """Return the subset of `item_ids` enriched within the last `max_age` seconds."""
+        item_ids = list(item_ids)
+        cutoff = time.time() - max_age
+        found = set()
+        with self.lock:
+            # One query per batch instead of one per id (SQLite allows 999 parameters)
+            for start in range(0, len(item_ids), 900):
+                batch = item_ids[start:start + 900]
+                placeholders = ", ".join("?" * len(batch))
+                found.update(row[0] for row in self.db.execute(
+                    f"SELECT item_id FROM items WHERE enriched_at >= ? AND item_id IN ({placeholders})",
+                    [cutoff] + batch,
+                ))
+        return found
+
+    def write(self, records):
+        now = time.time()
+        rows = [(record['ITEM ID'], now, json.dumps({column: record.get(column) for column in ITEM_COLUMNS},
+                                                    ensure_ascii=False))
+                for record in records]
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO items (item_id, enriched_at, details) VALUES (?, ?, ?)", rows)
+            self.db.commit()
+
+    def read(self):
+        """All details as a DataFrame of ITEM ID + DETAIL_COLUMNS."""
+        with self.lock:
+            rows = self.db.execute("SELECT item_id, enriched_at, details FROM items").fetchall()
+        return pd.DataFrame(
+            [{'ITEM ID': item, **json.loads(details),
+              'ENRICHED AT': datetime.fromtimestamp(enriched_at).isoformat(timespec='seconds')}
+             for item, enriched_at, details in rows],
+            columns=['ITEM ID'] + DETAIL_COLUMNS,
+        )
+
+    def merge_into(self, csv_filename):
+        """Rewrite `csv_filename` with the detail columns filled in from the store, matched on the URL's item id."""
+        details = self.read()
+        if details.empty or not os.path.exists(csv_filename):
+            return 0
+        with metrics.timer('merge'):
+            records = pd.read_csv(csv_filename, dtype=str)
+            # Columns from an earlier merge are replaced by the current details
+            records = records.drop(columns=[column for column in DETAIL_COLUMNS if column in records.columns])
+            records['ITEM ID'] = records['URL'].map(item_id)
+            merged = records.merge(details, on='ITEM ID', how='left').drop(columns=['ITEM ID'])
+            tmp_filename = csv_filename + ".tmp"
+            merged.to_csv(tmp_filename, index=False)
+            os.replace(tmp_filename, csv_filename)
+        return int(merged['ENRICHED AT'].notna().sum())
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class ItemDetailSite(Site):
+    """Item pages for the ids handed to `offer`, as they arrive.
+
+    Ids already queued this run or enriched within `max_age` seconds are
+    skipped. When the queue is full `offer` drops ids instead of waiting, so
+    the search crawl never stalls on enrichment. Whenever the queue runs
+    dry, ids from `stored_urls` (records stored by earlier runs, including
+    ids dropped then) are enriched instead, until `finish()` is called;
+    `urls()` then yields what is left in the queue and stops.
+    """
+
+    parse = staticmethod(parse_item_page)
+
+    def __init__(self, store, max_age, backlog=500, stored_urls=()):
+        self.store = store
+        self.max_age = max_age
+        self.queue = queue.Queue(maxsize=backlog)
+        self.stored_urls = stored_urls
+        self.offered = set()
+        self.finished = False
+        self.skipped = 0
+        self.deferred = 0
+
+    def _due(self, urls):
+        ids = {item_id(url) for url in urls} - {None} - self.offered
+        recent = self.store.recent(ids, self.max_age) if ids else set()
+        self.skipped += len(recent)
+        return ids - recent
+
+    def offer(self, records):
+        for item in self._due(record.get('URL') for record in records):
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.deferred += 1
+                metrics.inc('enrich_deferred')
+                continue
+            self.offered.add(item)
+
+    def _stored_ids(self):
+        urls = iter(self.stored_urls)
+        while True:
+            # Checked against the store in chunks, one query each
+            chunk = list(itertools.islice(urls, 500))
+            if not chunk:
+                return
+            for item in self._due(chunk):
+                if item not in self.offered:
+                    yield item
+
+    def finish(self):
+        self.finished = True
+        self.queue.put(_DONE)
+
+    def urls(self):
+        stored = self._stored_ids()
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                item = None if self.finished else next(stored, None)
+                if item is None:
+                    item = self.queue.get()
+            if item is _DONE:
+                return
+            self.offered.add(item)
+            yield ITEM_URL.format(item)
+
+    def key(self, record):
+        return record['ITEM ID']
+
+
+class ItemEnricher:
+    """Runs an ItemDetailSite pipeline on a background thread next to the search crawl.
+
+    `fetcher` is normally `search_fetcher.shared(workers)`: the same
+    connection pool, cache and per-host rate limits as the search pages, so
+    both together stay within one politeness budget, with at most `workers`
+    of the requests in flight being item pages.
+    """
+
+    def __init__(self, fetcher, store, max_age=7 * 24 * 3600, backlog=500, stored_urls=()):
+        self.store = store
+        self.site = ItemDetailSite(store, max_age, backlog, stored_urls)
+        self.pipeline = Pipeline(self.site, fetcher, store)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="enrich", daemon=True)
+
+    def _run(self):
+        try:
+            for _ in self.pipeline.run():
+                pass
+        except Exception as e:
+            self.error = e
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def offer(self, records):
+        """Queue the item ids of newly stored search records for enrichment."""
+        if self.thread.is_alive():
+            self.site.offer(records)
+
+    def close(self):
+        """Wait for the queued items to be enriched; return how many were."""
+        if self.thread.is_alive():
+            self.site.finish()
+        self.thread.join()
+        if self.error:
+            raise RuntimeError("Item enrichment failed") from self.error
+        return self.pipeline.collected
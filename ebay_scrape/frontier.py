@@ -0,0 +1,141 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from ebay_site import search_page_urls
+
+QUEUED = 'queued'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class Frontier:
+    """Persistent crawl frontier for search result pages.
+
+    Each URL is queued, in flight, done, failed or skipped, and carries its
+    query, page number and a priority (higher is claimed first, then lower
+    pages). Every state change is committed as it happens, so a stopped
+    crawl resumes where it left off. `claim` leases URLs to this worker; a
+    lease that is not finished within `lease_seconds` (the crawl died) goes
+    back to the queue. The URL primary key keeps every page queued once.
+
+    Several crawl processes on one box can share a frontier, each claiming
+    its own pages; main.py stores their records under a lock file (see
+    dedup.SharedSink), so they can share the output folder too.
+    """
+
+    def __init__(self, filename, lease_seconds=300, max_attempts=3, worker=None):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                query TEXT,
+                page INTEGER,
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                worker TEXT,
+                leased_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                records INTEGER
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS frontier_queue ON frontier (state, priority DESC, page)")
+
+    def add(self, url, query=None, page=None, priority=0):
+        """Queue `url` unless it was ever added before; return True if it was new."""
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO frontier (url, query, page, priority, state) VALUES (?, ?, ?, ?, ?)",
+                (url, query, page, priority, QUEUED),
+            )
+            return cursor.rowcount == 1
+
+    def seed(self, queries, max_pages=100, priority=0):
+        """Queue the first `max_pages` search pages of each query; return how many were new."""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            added = 0
+            for query in queries:
+                for page, url in enumerate(search_page_urls(query, max_pages=max_pages), start=1):
+                    added += self.db.execute(
+                        "INSERT OR IGNORE INTO frontier (url, query, page, priority, state) VALUES (?, ?, ?, ?, ?)",
+                        (url, query, page, priority, QUEUED),
+                    ).rowcount
+            self.db.execute("COMMIT")
+            return added
+
+    def claim(self):
+        """Lease the next queued (or abandoned) URL to this worker; return it, or None if nothing is left."""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            row = self.db.execute(
+                """SELECT url FROM frontier
+                   WHERE state = ? OR (state = ? AND leased_at < ?)
+                   ORDER BY priority DESC, page, rowid LIMIT 1""",
+                (QUEUED, IN_FLIGHT, now - self.lease_seconds),
+            ).fetchone()
+            if row is not None:
+                self.db.execute(
+                    "UPDATE frontier SET state = ?, worker = ?, leased_at = ?, attempts = attempts + 1 WHERE url = ?",
+                    (IN_FLIGHT, self.worker, now, row[0]),
+                )
+            self.db.execute("COMMIT")
+        return row[0] if row else None
+
+    def done(self, url, records=0, last=False):
+        """Mark `url` as crawled. `last` means it had no next page, so later pages of its query are skipped."""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("UPDATE frontier SET state = ?, records = ? WHERE url = ?", (DONE, records, url))
+            if last:
+                self.db.execute(
+                    """UPDATE frontier SET state = ? WHERE state = ? AND page > ?
+                       AND query = (SELECT query FROM frontier WHERE url = ?)""",
+                    (SKIPPED, QUEUED, self._page(url), url),
+                )
+            self.db.execute("COMMIT")
+
+    def _page(self, url):
+        row = self.db.execute("SELECT page FROM frontier WHERE url = ?", (url,)).fetchone()
+        return row[0] if row and row[0] is not None else float('inf')
+
+    def failed(self, url):
+        """Put `url` back in the queue, or give up on it after `max_attempts` claims."""
+        with self.lock:
+            self.db.execute(
+                "UPDATE frontier SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END WHERE url = ?",
+                (self.max_attempts, FAILED, QUEUED, url),
+            )
+
+    def release(self):
+        """Return this worker's unfinished leases to the queue, e.g. when stopping early."""
+        with self.lock:
+            self.db.execute(
+                "UPDATE frontier SET state = ?, attempts = attempts - 1 WHERE state = ? AND worker = ?",
+                (QUEUED, IN_FLIGHT, self.worker),
+            )
+
+    def reset(self):
+        """Queue every URL again, e.g. to replay a finished crawl from the HTTP cache."""
+        with self.lock:
+            self.db.execute("UPDATE frontier SET state = ?, worker = NULL, leased_at = NULL, attempts = 0", (QUEUED,))
+
+    def counts(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall())
+
+    def close(self):
+        self.release()
+        with self.lock:
+            self.db.close()
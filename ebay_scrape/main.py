@@ -1,153 +1,85 @@
-import re
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 import pandas as pd
-import time
-import random
+import argparse
 import os
-
-# Random user agents list
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/119.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1"
-]
-
-def get_random_headers():
-    return {
-        "User-Agent": random.choice(USER_AGENTS),
-        "Accept-Language": "en-US, en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-        "Referer": "https://www.google.com/",
-        "DNT": "1",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-    }
-
-def scrape_ebay_data(url):
-    session = requests.Session()
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    
-    data = []
-    next_url = None
-
-    try:
-        headers = get_random_headers()
-        print(f"Fetching page: {url}")
-        response = session.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        if not soup.title or "eBay" not in soup.title.text:
-            return [], None
-
-        product_containers = soup.select(".s-item__wrapper")
-        print(f"Found {len(product_containers)} products")
-
-        for container in product_containers:
-            product = {
-                'PRODUCT NAME': None,
-                'PRICE': None,
-                'CONDITION': None,
-                'SELLER': None,
-                'SELLER RATING': None,
-                'RATING COUNT': None,
-                'SELLER LOCATION': None,
-                'URL': None,
-            }
-
-            # Clean the product name (remove "New Listing" prefix)
-            try:
-                name = container.select_one(".s-item__title").text.strip()
-                product['PRODUCT NAME'] = re.sub(r'^New Listing\s*', '', name)
-            except AttributeError:
-                continue
-
-            try:
-                price = container.select_one(".s-item__price").text.strip()
-                product['PRICE'] = price
-            except AttributeError:
-                continue
-
-            try:
-                condition = container.select_one(".SECONDARY_INFO").text.strip()
-                product['CONDITION'] = condition
-            except AttributeError:
-                pass
-
-            # Extract seller info (name, rating count, rating percentage) using regex
-            try:
-                seller_info = container.select_one(".s-item__seller-info-text")
-                if seller_info:
-                    seller_text = seller_info.text.strip()
-                    # Expected format: "sellerName (ratingCount) rating%"
-                    match = re.search(r'(.+?)\s*\((\d+)\)\s*(\S+)', seller_text)
-                    if match:
-                        product['SELLER'] = match.group(1).strip()
-                        product['RATING COUNT'] = match.group(2).strip()
-                        product['SELLER RATING'] = match.group(3).strip()
-                    else:
-                        product['SELLER'] = seller_text
-                        product['RATING COUNT'] = "N/A"
-                        product['SELLER RATING'] = "N/A"
-                else:
-                    product['SELLER'] = "N/A"
-                    product['RATING COUNT'] = "N/A"
-                    product['SELLER RATING'] = "N/A"
-            except AttributeError:
-                product['SELLER'] = "N/A"
-                product['RATING COUNT'] = "N/A"
-                product['SELLER RATING'] = "N/A"
-
-            try:
-                seller_location = container.select_one(".s-item__location.s-item__itemLocation").text.strip()
-                product['SELLER LOCATION'] = seller_location
-            except AttributeError:
-                pass
-
-            try:
-                link_element = container.select_one(".s-item__link")
-                if link_element and link_element.has_attr("href"):
-                    product['URL'] = link_element["href"].split("?")[0]
-            except AttributeError:
-                pass
-
-            if all(value not in [None, "", "N/A"] for value in product.values()):
-                            data.append(product)
-
-        next_page_link = soup.find('a', {'class': 'pagination__next'})
-        if next_page_link and next_page_link.has_attr('href'):
-            next_url = urljoin("https://www.ebay.com", next_page_link['href'])
-
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return [], None
-
-    return data, next_url
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_core.cache import ResponseCache  # noqa: E402
+from scraper_core.fetcher import PageFetcher, random_headers  # noqa: E402
+from scraper_core.metrics import metrics, profiled  # noqa: E402
+from scraper_core.normalize import DATASETS, column_types, normalizer  # noqa: E402
+from scraper_core.neardup import SinkNearDuplicates  # noqa: E402
+from scraper_core.pipeline import AllNew, Pipeline  # noqa: E402
+from scraper_core.sinks import make_sink, first_number, FileLock, StreamingSink  # noqa: E402
+from ebay_site import EbaySite, looks_blocked  # noqa: E402
+from frontier import Frontier  # noqa: E402
+from dedup import KeyIndex, SharedSink  # noqa: E402
+from enrich import DetailStore, ItemEnricher  # noqa: E402
+
+# Typed columns for storage backends that support them
+COLUMN_TYPES = {'RATING COUNT': 'int', 'PRICE VALUE': 'float', **column_types(DATASETS['ebay'])}
+DERIVED_COLUMNS = {'PRICE VALUE': lambda df: first_number(df['PRICE'])}
+
+# Cached pages are reused for a week, search result pages only for an hour
+CACHE_TTL = 7 * 24 * 3600
+CACHE_TTL_OVERRIDES = [(r'/sch/', 3600)]
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Scrape eBay search results")
+    arg_parser.add_argument('--offline', action='store_true',
+                            help="replay pages from the HTTP cache only, without network requests")
+    arg_parser.add_argument('--query', action='append', dest='queries',
+                            help="search query to crawl (repeatable); queued in the frontier alongside earlier ones")
+    arg_parser.add_argument('--restart', action='store_true',
+                            help="queue every frontier page again instead of resuming "
+                                 "(while no other crawl is running on this folder)")
+    arg_parser.add_argument('--enrich', action='store_true',
+                            help="also fetch item pages for shipping, quantity sold, seller feedback and item specifics")
+    arg_parser.add_argument('--metrics', metavar='PATH',
+                            help="record per-stage timings and write them here (.prom: Prometheus text, else JSON lines)")
+    arg_parser.add_argument('--profile', metavar='PATH', help="run the crawl loop under cProfile and dump stats here")
+    args = arg_parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+
     output_folder = 'ebay_scrape'
     os.makedirs(output_folder, exist_ok=True)
     csv_filename = os.path.join(output_folder, 'ebay_data.csv')
-    request_delay = (5, 10)
+    storage_backend = 'csv'  # or 'parquet' (exported back to csv_filename at the end of a run)
+    search_queries = args.queries or ["electronics"]
+    concurrent_pages = 8
+    enrich_workers = 2  # of the concurrent pages, how many may be item pages (--enrich)
+    parse_workers = os.cpu_count()
+    html_parser = 'lxml'  # or 'html.parser'
     max_pages_per_query = 100
     target_records = 5000
-
-    if os.path.exists(csv_filename):
-        existing_df = pd.read_csv(csv_filename)
-        existing_count = len(existing_df)
+    near_duplicates = True  # also skip listings whose title and price nearly match a stored one
+    frontier = Frontier(os.path.join(output_folder, 'frontier.sqlite'))
+    cache = ResponseCache(os.path.join(output_folder, 'http_cache.sqlite'),
+                          default_ttl=CACHE_TTL, ttl_overrides=CACHE_TTL_OVERRIDES)
+
+    # Several crawls may run on this folder at once (the frontier leases keep them on different pages);
+    # each takes this lock around every change to the stored data and its sidecar indexes
+    output_lock = FileLock(os.path.join(output_folder, 'ebay_data.lock'))
+    with output_lock:
+        if storage_backend == 'csv':
+            sink = make_sink('csv', csv_filename, normalize=normalizer('ebay'))
+        else:
+            sink = make_sink(storage_backend, os.path.join(output_folder, f'ebay_data.{storage_backend}'),
+                             types=COLUMN_TYPES, derived=DERIVED_COLUMNS, normalize=normalizer('ebay'))
+            if not sink.last_modified() and os.path.exists(csv_filename):
+                # Seed the new backend with the records collected so far
+                sink.write(pd.read_csv(csv_filename, dtype=str))
+        key_index = KeyIndex(sink)
+        # Checked only for records whose URL is new, against what was stored when this crawl started
+        near_index = SinkNearDuplicates(sink, 'ebay') if near_duplicates else None
+        # Stored items are enriched whenever no new ones are waiting, newest first
+        stored_urls = sink.read_columns(['URL'])['URL'].dropna()[::-1] if args.enrich else ()
+    shared_sink = SharedSink(sink, key_index, output_lock)
+    sink = StreamingSink(shared_sink, batch_size=200)
+    existing_count = len(key_index)
+    if existing_count:
         print(f"Found existing file with {existing_count} records")
-    else:
-        existing_df = pd.DataFrame()
-        existing_count = 0
 
     target_remaining = max(target_records - existing_count, 0)
     
@@ -155,55 +87,67 @@ if __name__ == "__main__":
         print(f"Already have {existing_count} records. Target achieved.")
         exit()
 
-    all_data = []
-    collected_new = 0
-    current_url = "https://www.ebay.com/sch/i.html?_nkw=electronics&_sacat=0&_pgn=1"
-    page_count = 0
-
-    while current_url and page_count < max_pages_per_query and collected_new < target_remaining:
-        page_count += 1
-        scraped_data, next_url = scrape_ebay_data(current_url)
-        
-        if scraped_data:
-            clean_batch = pd.DataFrame(scraped_data)
-            clean_batch = clean_batch.drop_duplicates(
-                subset=['PRODUCT NAME', 'PRICE'],
-                keep='first'
-            )
-            
-            if not clean_batch.empty:
-                if not existing_df.empty:
-                    mask = ~clean_batch['PRODUCT NAME'].isin(existing_df['PRODUCT NAME']) & \
-                           ~clean_batch['PRICE'].isin(existing_df['PRICE'])
-                    clean_batch = clean_batch[mask]
-
-                remaining_needed = target_remaining - collected_new
-                clean_batch = clean_batch.head(remaining_needed)
-                
-                if not clean_batch.empty:
-                    all_data.append(clean_batch)
-                    clean_batch.to_csv(csv_filename, mode='a', index=False, header=not os.path.exists(csv_filename))
-                    collected_new += len(clean_batch)
-                    print(f"Page: {page_count}")
-                    print(f"New clean records: {len(clean_batch)} | Total collected: {collected_new}")
-
-        current_url = next_url if next_url and collected_new < target_remaining else None
-        if current_url:
-            sleep_time = random.uniform(*request_delay)
-            time.sleep(sleep_time)
-
-    if all_data:
-        new_df = pd.concat(all_data)
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-        final_df = combined_df.drop_duplicates(
-            subset=['PRODUCT NAME', 'PRICE'],
-            keep='first'
-        ).head(target_records)
-        
-        final_df.to_csv(csv_filename, index=False)
-        print(f"\nTotal records after deduplication: {len(final_df)}")
-        print(f"Data successfully saved to {csv_filename}")
+    if args.restart:
+        frontier.reset()
+    frontier.seed(search_queries, max_pages=max_pages_per_query)
+    print(f"Frontier: {frontier.counts()}")
+
+    site = EbaySite(frontier, parser=html_parser, offline=args.offline, cache=cache)
+    fetcher = PageFetcher(random_headers, max_workers=concurrent_pages, cache=cache, offline=args.offline,
+                          is_blocked=looks_blocked)
+    seen = AllNew(key_index, near_index) if near_index is not None else key_index
+    pipeline = Pipeline(site, fetcher, sink, seen=seen, parse_workers=parse_workers, limit=target_remaining)
+    enricher = None
+    if args.enrich:
+        # Item pages share the search pages' connection pool, cache and rate limits
+        details = DetailStore(os.path.join(output_folder, 'item_details.sqlite'))
+        enricher = ItemEnricher(fetcher.shared(enrich_workers), details, max_age=CACHE_TTL,
+                                stored_urls=stored_urls).start()
+    with fetcher, profiled(args.profile):
+        for current_url, clean_batch in pipeline.run():
+            if clean_batch:
+                print(f"Page: {pipeline.pages}")
+                print(f"New clean records: {len(clean_batch)} | Total collected: {pipeline.collected}")
+                if enricher:
+                    enricher.offer(clean_batch)
+        if enricher:
+            print("Waiting for queued item pages...")
+            enriched = enricher.close()
+    collected_new = pipeline.collected
+
+    sink.close()
+    if collected_new:
+        sink.compact()
+        sink.export_csv(csv_filename)
+        print(f"\nTotal records: {existing_count + collected_new}")
+        print(f"Data successfully saved to {sink.path}")
     else:
         print("No new data collected")
+    if shared_sink.dropped:
+        print(f"{shared_sink.dropped} records were stored first by another crawl")
+    if enricher:
+        with output_lock:
+            merged = details.merge_into(csv_filename)
+        details.close()
+        print(f"Item details: {enriched} enriched this run ({enricher.site.skipped} recently enriched, "
+              f"{enricher.site.deferred} deferred), {merged} records with details")
+    # Closed last so the key indexes are at least as new as the stored data
+    with output_lock:
+        key_index.catch_up()
+        # Records other crawls stored are missing from the near-duplicate index, so it is left to be rebuilt
+        if near_index is not None and not key_index.foreign:
+            near_index.close()
+        key_index.close()
+    output_lock.close()
+    # Pages claimed but not processed (target met, interrupted) go back to the queue
+    frontier.release()
+    print(f"Frontier: {frontier.counts()}")
+    frontier.close()
+    print(f"Rate control: {fetcher.limiter.metrics()}")
+    print(f"HTTP cache: {cache.hits} hits, {cache.revalidated} revalidated, {cache.misses} misses")
+    cache.close()
+    if args.metrics:
+        metrics.export(args.metrics)
+        print(f"Metrics written to {args.metrics}")
 
     print("\nScraping session completed")
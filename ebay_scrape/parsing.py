@@ -0,0 +1,249 @@
+import json
+import re
+import time
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from lxml import etree, html
+
+from dedup import item_id
+
+NEW_LISTING_PREFIX = re.compile(r'^New Listing\s*')
+SELLER_INFO = re.compile(r'(.+?)\s*\((\d+)\)\s*(\S+)')
+EBAY_BASE_URL = "https://www.ebay.com"
+
+
+def _clean_title(text, element):
+    return {'PRODUCT NAME': NEW_LISTING_PREFIX.sub('', text)}
+
+
+def _split_seller_info(text, element):
+    # Expected format: "sellerName (ratingCount) rating%"
+    match = SELLER_INFO.search(text)
+    if not match:
+        return {'SELLER': text, 'RATING COUNT': "N/A", 'SELLER RATING': "N/A"}
+    return {
+        'SELLER': match.group(1).strip(),
+        'RATING COUNT': match.group(2).strip(),
+        'SELLER RATING': match.group(3).strip(),
+    }
+
+
+def _strip_query(text, element):
+    href = element.get('href')
+    return {'URL': href.split("?")[0] if href else None}
+
+
+# Field name -> class selector -> post-processing. The first element in a
+# container matching a selector wins, like select_one did.
+PRODUCT_FIELDS = [
+    ('PRODUCT NAME', '.s-item__title', _clean_title),
+    ('PRICE', '.s-item__price', None),
+    ('CONDITION', '.SECONDARY_INFO', None),
+    ('SELLER', '.s-item__seller-info-text', _split_seller_info),
+    ('SELLER LOCATION', '.s-item__location.s-item__itemLocation', None),
+    ('URL', '.s-item__link', _strip_query),
+]
+
+PRODUCT_COLUMNS = [
+    'PRODUCT NAME', 'PRICE', 'CONDITION', 'SELLER',
+    'SELLER RATING', 'RATING COUNT', 'SELLER LOCATION', 'URL',
+]
+
+
+class ProductExtractor:
+    """Evaluates a field spec against a product container in a single walk of its subtree.
+
+    Selectors are restricted to compound class selectors (".a.b") and are
+    compiled once into class sets, so each element is tested with a subset
+    check instead of re-running a CSS query per field.
+    """
+
+    def __init__(self, fields=PRODUCT_FIELDS, columns=PRODUCT_COLUMNS):
+        self.columns = columns
+        self.fields = []
+        for name, selector, post_process in fields:
+            classes = frozenset(part for part in selector.split('.') if part)
+            self.fields.append((name, classes, post_process))
+
+    def extract(self, elements):
+        """`elements` yields (class_set, text_getter, element) for the container subtree in document order."""
+        product = dict.fromkeys(self.columns)
+        remaining = list(self.fields)
+        for classes, get_text, element in elements:
+            if not classes:
+                continue
+            for field in remaining:
+                name, required, post_process = field
+                if required <= classes:
+                    text = get_text().strip()
+                    if post_process:
+                        product.update(post_process(text, element))
+                    else:
+                        product[name] = text
+                    remaining.remove(field)
+                    break
+            if not remaining:
+                break
+
+        if all(value not in [None, "", "N/A"] for value in product.values()):
+            return product
+        return None
+
+
+_extractor = ProductExtractor()
+_containers_xpath = etree.XPath(
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' s-item__wrapper ')]"
+)
+_next_link_xpath = etree.XPath(
+    "//a[contains(concat(' ', normalize-space(@class), ' '), ' pagination__next ')][@href]"
+)
+
+
+def _lxml_elements(container):
+    for element in container.iter():
+        class_attr = element.get('class') if isinstance(element.tag, str) else None
+        if class_attr:
+            yield frozenset(class_attr.split()), element.text_content, element
+
+
+def _soup_elements(container):
+    for element in container.find_all(True):
+        classes = element.get('class')
+        if classes:
+            yield frozenset(classes), element.get_text, element
+
+
+def _parse_with_lxml(content, timings):
+    started = time.perf_counter()
+    tree = html.fromstring(content)
+    title = tree.findtext('.//title')
+    if not title or "eBay" not in title:
+        return None, None
+
+    containers = _containers_xpath(tree)
+    print(f"Found {len(containers)} products")
+    parsed = time.perf_counter()
+    data = [_extractor.extract(_lxml_elements(container)) for container in containers]
+    timings['parse'], timings['extract'] = parsed - started, time.perf_counter() - parsed
+
+    next_url = None
+    next_links = _next_link_xpath(tree)
+    if next_links:
+        next_url = urljoin(EBAY_BASE_URL, next_links[0].get('href'))
+    return data, next_url
+
+
+def _parse_with_soup(content, parser, timings):
+    started = time.perf_counter()
+    soup = BeautifulSoup(content, parser)
+    if not soup.title or "eBay" not in soup.title.text:
+        return None, None
+
+    containers = soup.select(".s-item__wrapper")
+    print(f"Found {len(containers)} products")
+    parsed = time.perf_counter()
+    data = [_extractor.extract(_soup_elements(container)) for container in containers]
+    timings['parse'], timings['extract'] = parsed - started, time.perf_counter() - parsed
+
+    next_url = None
+    next_page_link = soup.find('a', {'class': 'pagination__next'})
+    if next_page_link and next_page_link.has_attr('href'):
+        next_url = urljoin(EBAY_BASE_URL, next_page_link['href'])
+    return data, next_url
+
+
+def parse_ebay_page(content, parser='lxml', timings=None):
+    """Return (products, next page URL); `timings`, if given, receives the parse and extract seconds.
+
+    Products are None when `content` is not an eBay results page or could not be parsed.
+    """
+    timings = {} if timings is None else timings
+    try:
+        if parser == 'lxml':
+            data, next_url = _parse_with_lxml(content, timings)
+        else:
+            data, next_url = _parse_with_soup(content, parser, timings)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return None, None
+
+    if data is None:
+        return None, None
+    return [product for product in data if product], next_url
+
+
+def parse_search_page(url, content, timings, parser='lxml'):
+    """Pipeline parse step (see scraper_core.pipeline.Site): products, and whether a next page exists.
+
+    Only a results page without a `pagination__next` link is the last one;
+    a page that cannot be parsed is reported as such (None) so it is retried.
+    """
+    data, next_url = parse_ebay_page(content, parser, timings)
+    return data, data is not None and next_url is not None
+
+
+# Item pages (see enrich.py). Item specifics are label/value pairs; the seller
+# card reads like "Seller Name (12,345) 99.6% positive".
+ITEM_COLUMNS = ['ITEM SPECIFICS', 'SHIPPING', 'QUANTITY SOLD', 'SELLER FEEDBACK', 'SELLER FEEDBACK SCORE']
+QUANTITY_SOLD = re.compile(r'([\d,]+)\s+sold')
+FEEDBACK_PERCENT = re.compile(r'(\d+(?:\.\d+)?)%\s*positive')
+FEEDBACK_SCORE = re.compile(r'\(([\d,]+)\)')
+
+
+def _class_xpath(tag, class_name):
+    return etree.XPath(f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]")
+
+
+_specifics_xpath = _class_xpath('div', 'ux-layout-section-evo__col')
+_label_xpath = _class_xpath('div', 'ux-labels-values__labels')
+_value_xpath = _class_xpath('div', 'ux-labels-values__values')
+_shipping_xpath = _class_xpath('div', 'ux-labels-values--shipping')
+_quantity_xpath = _class_xpath('div', 'x-quantity__availability')
+_seller_card_xpath = _class_xpath('div', 'x-sellercard-atf')
+
+
+def _squashed(element):
+    return ' '.join(element.text_content().split())
+
+
+def _item_details(tree):
+    specifics = {}
+    for column in _specifics_xpath(tree):
+        labels, values = _label_xpath(column), _value_xpath(column)
+        if labels and values:
+            specifics[_squashed(labels[0]).rstrip(':')] = _squashed(values[0])
+
+    shipping = _shipping_xpath(tree)
+    shipping_values = _value_xpath(shipping[0]) if shipping else []
+    quantity = _quantity_xpath(tree)
+    sold = QUANTITY_SOLD.search(_squashed(quantity[0])) if quantity else None
+    seller_card = _seller_card_xpath(tree)
+    seller_text = _squashed(seller_card[0]) if seller_card else ""
+    percent, score = FEEDBACK_PERCENT.search(seller_text), FEEDBACK_SCORE.search(seller_text)
+
+    return {
+        'ITEM SPECIFICS': json.dumps(specifics, ensure_ascii=False) if specifics else None,
+        'SHIPPING': _squashed(shipping_values[0]) if shipping_values else None,
+        'QUANTITY SOLD': sold.group(1).replace(',', '') if sold else None,
+        'SELLER FEEDBACK': percent.group(1) if percent else None,
+        'SELLER FEEDBACK SCORE': score.group(1).replace(',', '') if score else None,
+    }
+
+
+def parse_item_page(url, content, timings):
+    """Pipeline parse step for item pages: one record of ITEM_COLUMNS plus the ITEM ID, or none."""
+    try:
+        tree = html.fromstring(content)
+    except (etree.ParserError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return [], False
+    title = tree.findtext('.//title')
+    item = item_id(url)
+    if not title or "eBay" not in title or not item:
+        return [], False
+    details = _item_details(tree)
+    if not any(details.values()):
+        # Not an item page we can read; left to be retried rather than stored empty
+        return [], False
+    return [{'ITEM ID': item, **details}], False
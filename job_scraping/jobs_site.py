@@ -0,0 +1,54 @@
+from urllib.parse import urlencode
+
+from scraper_core.pipeline import Site
+
+SEARCH_URL = 'https://www.timesjobs.com/candidate/job-search.html'
+
+
+def search_url(keyword, location='', page=1):
+    params = {'searchType': 'personalizedSearch', 'from': 'submit', 'searchTextSrc': '', 'searchTextText': '',
+              'txtKeywords': keyword, 'txtLocation': location, 'sequence': page, 'startPage': 1}
+    return f"{SEARCH_URL}?{urlencode(params)}"
+
+
+class JobSearchSite(Site):
+    """TimesJobs searches, one (keyword, location) pair each, as a Pipeline site.
+
+    Page 1 of every search is requested first, then page 2 and so on; a
+    search whose page comes back without postings gets no further pages.
+    `search_of` maps the URLs handed out so far to their search.
+    """
+
+    def __init__(self, searches, max_pages, extractor):
+        self.searches = searches
+        self.max_pages = max_pages
+        self.extractor = extractor
+        self.exhausted = set()
+        self.search_of = {}
+
+    def urls(self):
+        for page in range(1, self.max_pages + 1):
+            for search in self.searches:
+                if search not in self.exhausted:
+                    url = search_url(*search, page=page)
+                    self.search_of[url] = search
+                    yield url
+
+    def parse(self, url, content, timings):
+        keyword, location = self.search_of[url]
+        jobs, postings = self.extractor.extract(content)
+        for job in jobs:
+            job['keyword'] = keyword
+            job['search_location'] = location
+        return jobs, postings > 0
+
+    def key(self, job):
+        return job['job_id']
+
+    def page_done(self, url, records, more):
+        if not more:
+            # Past the last result page of this search
+            self.exhausted.add(self.search_of[url])
+
+    def page_failed(self, url):
+        self.search_of.pop(url, None)
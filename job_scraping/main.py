@@ -1,21 +1,64 @@
-from bs4 import BeautifulSoup
-import requests
+import argparse
+import os
+import sys
 
-html_text = requests.get('https://www.timesjobs.com/candidate/job-search.html?searchType=personalizedSearch&from=submit&searchTextSrc=&searchTextText=&txtKeywords=python&txtLocation=').text
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_core.cache import ResponseCache  # noqa: E402
+from scraper_core.fetcher import PageFetcher  # noqa: E402
+from scraper_core.pipeline import KeySet, Pipeline  # noqa: E402
+from scraper_core.sinks import make_sink, StreamingSink  # noqa: E402
+from jobs_site import JobSearchSite  # noqa: E402
+from parsing import JobExtractor  # noqa: E402
 
-soup = BeautifulSoup(html_text, 'lxml')
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US, en;q=0.9",
+}
 
-jobs = soup.find_all('li', class_='clearfix job-bx wht-shd-bx')
 
-for job in jobs:
-    published_at = job.find('span', class_='sim-posted').get_text(strip=True)
-    if 'few' in published_at:
-        company_name = job.find('h3', class_='joblist-comp-name').get_text(strip=True)
-        skills = job.find('span', class_='srp-skills').get_text(strip=True) if job.find('span', class_='srp-skills') else "Not Specified"        
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Collect recently posted jobs from timesjobs")
+    arg_parser.add_argument('--keyword', action='append', dest='keywords',
+                            help="search keyword (repeatable, default: python)")
+    arg_parser.add_argument('--location', action='append', dest='locations',
+                            help="search location (repeatable, default: anywhere)")
+    arg_parser.add_argument('--pages', type=int, default=10, help="result pages per keyword and location")
+    arg_parser.add_argument('--offline', action='store_true',
+                            help="replay pages from the HTTP cache only, without network requests")
+    args = arg_parser.parse_args()
 
-        print()
-        print(f'Company name: {company_name}')
-        print(f'Skills required: {skills}')
-        print(f'Posted at: {published_at}')
-        
-    print('TOO OLD!')
\ No newline at end of file
+    output_folder = os.path.dirname(os.path.abspath(__file__))
+    storage_backend = 'csv'  # or 'parquet' (requires pyarrow)
+    concurrent_pages = 8
+    searches = list(dict.fromkeys((keyword, location) for keyword in args.keywords or ['python']
+                                  for location in args.locations or ['']))
+
+    # Job listings go stale quickly, so cached search pages are reused for 15 minutes only
+    cache = ResponseCache(os.path.join(output_folder, 'http_cache.sqlite'),
+                          ttl_overrides=[(r'/job-search\.html', 15 * 60)])
+    sink = make_sink(storage_backend, os.path.join(output_folder, f'jobs.{storage_backend}'))
+    site = JobSearchSite(searches, args.pages, JobExtractor())
+    # The same posting turns up under several keywords and locations
+    seen_ids = KeySet(site.key, sink.read_columns(['job_id'])['job_id'].dropna())
+    existing_count = len(seen_ids)
+    sink = StreamingSink(sink, batch_size=100)
+
+    fetcher = PageFetcher(lambda: HEADERS, max_workers=concurrent_pages, rate=1, cache=cache, offline=args.offline)
+    pipeline = Pipeline(site, fetcher, sink, seen=seen_ids)
+    with fetcher:
+        for url, new_jobs in pipeline.run():
+            keyword, location = search = site.search_of.pop(url)
+            if search in site.exhausted:
+                continue
+            print(f"{keyword!r} in {location or 'any location'}: {len(new_jobs)} new jobs "
+                  f"| Total collected: {pipeline.collected}")
+    collected_new = pipeline.collected
+
+    sink.close()
+    cache.close()
+    print(f"\nSkipped {site.extractor.stale} older postings")
+    if collected_new:
+        print(f"Total jobs: {existing_count + collected_new}")
+        print(f"Data successfully saved to {sink.path}")
+    else:
+        print("No new jobs collected")
@@ -0,0 +1,85 @@
+import re
+
+from lxml import etree, html
+
+# Postings TimesJobs labels "Posted few days ago"; older ones say "N days" or "1 month"
+FRESH_POSTING = re.compile(r'\bfew\b')
+JOB_ID = re.compile(r'-(\d+)(?:\?|$)')
+
+
+def _class_xpath(tag, class_name, relative=False):
+    prefix = './/' if relative else '//'
+    return etree.XPath(f"{prefix}{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]")
+
+
+_jobs_xpath = _class_xpath('li', 'job-bx')
+_posted_xpath = _class_xpath('span', 'sim-posted', relative=True)
+_title_xpath = etree.XPath('.//header//h2/a')
+_company_xpath = _class_xpath('h3', 'joblist-comp-name', relative=True)
+_details_xpath = etree.XPath("./ul[contains(concat(' ', normalize-space(@class), ' '), ' top-jd-dtl ')]/li")
+_skills_xpath = _class_xpath('span', 'srp-skills', relative=True)
+_job_id_xpath = etree.XPath(".//input[@id='jobid']/@value")
+
+
+def _text(elements, default=None):
+    return ' '.join(elements[0].text_content().split()) if elements else default
+
+
+class JobExtractor:
+    """Pulls job postings out of TimesJobs search result pages.
+
+    The XPaths are compiled once at import, so one extractor serves every page
+    of a run. Each posting's `sim-posted` label is checked with `is_fresh`
+    first; stale postings are counted and skipped before any other field is
+    looked at.
+    """
+
+    def __init__(self, is_fresh=FRESH_POSTING.search):
+        self.is_fresh = is_fresh
+        self.stale = 0
+
+    def extract(self, content):
+        """Return (fresh jobs as dicts, number of postings on the page)."""
+        tree = html.fromstring(content)
+        postings = _jobs_xpath(tree)
+        jobs = []
+        for posting in postings:
+            published_at = _text(_posted_xpath(posting), "")
+            if not self.is_fresh(published_at):
+                self.stale += 1
+                continue
+            jobs.append(self._fields(posting, published_at))
+        return jobs, len(postings)
+
+    def _fields(self, posting, published_at):
+        title_link = _title_xpath(posting)
+        url = title_link[0].get('href') if title_link else None
+        job_ids = _job_id_xpath(posting)
+        job_id = job_ids[0] if job_ids else None
+        if not job_id and url:
+            match = JOB_ID.search(url)
+            job_id = match.group(1) if match else url.split('?')[0]
+
+        company = _company_xpath(posting)
+        # The company heading also holds a "(More Jobs)" link
+        company_name = ' '.join(company[0].text.split()) if company and company[0].text else _text(company)
+
+        experience = location = None
+        for detail in _details_xpath(posting):
+            icon = detail.findtext('i') or ''
+            text = ' '.join(''.join(detail.itertext()).replace(icon, '', 1).split())
+            if 'location' in icon:
+                location = text
+            elif 'card_travel' in icon:
+                experience = text
+
+        return {
+            'job_id': job_id,
+            'title': _text(title_link),
+            'company_name': company_name,
+            'experience': experience,
+            'location': location,
+            'skills': _text(_skills_xpath(posting), "Not Specified"),
+            'published_at': published_at,
+            'url': url.split('?')[0] if url else None,
+        }
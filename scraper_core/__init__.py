@@ -0,0 +1 @@
+"""Building blocks shared by the site scrapers (storage sinks, ...)."""
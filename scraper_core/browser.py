@@ -0,0 +1,323 @@
+"""Selenium building blocks: a pool of worker browsers, warm long-lived browsers, and a fetcher on top."""
+import copy
+import functools
+import logging
+import queue
+import threading
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from urllib3.exceptions import HTTPError as DriverConnectionError
+from webdriver_manager.chrome import ChromeDriverManager
+
+from scraper_core.metrics import metrics
+from scraper_core.ratelimit import TokenBucket
+
+_DONE = object()
+
+# Errors that mean the browser itself is gone rather than the page being odd; a dead chromedriver
+# surfaces as urllib3's MaxRetryError/ProtocolError, which are not builtin ConnectionErrors
+DRIVER_CRASHES = (InvalidSessionIdException, ConnectionError, DriverConnectionError)
+CRASH_MESSAGES = ("session deleted", "chrome not reachable", "disconnected")
+
+# URL patterns dropped by DriverPool(block_resources=...) through the DevTools protocol
+BLOCKED_RESOURCES = {
+    'images': ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    'fonts': ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    'analytics': [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*connect.facebook.net*", "*hotjar.com*", "*clarity.ms*",
+    ],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def chromedriver_path():
+    """Resolve the chromedriver binary once per process instead of on every browser start."""
+    return ChromeDriverManager().install()
+
+
+def is_driver_crash(error):
+    if isinstance(error, DRIVER_CRASHES):
+        return True
+    message = str(error).lower()
+    return isinstance(error, WebDriverException) and any(text in message for text in CRASH_MESSAGES)
+
+
+class DetailWorkerPool:
+    """Visits URLs with several browsers at once.
+
+    Each worker thread owns its own driver from `driver_factory` and pulls URLs
+    from a shared queue, which takes at most two URLs per worker ahead of their
+    results; every page load draws from one TokenBucket so the whole pool
+    respects a global rate. `extract(driver, url)` returns a
+    result or None and should let browser crashes (see is_driver_crash)
+    propagate. A worker whose browser crashes quits it, starts a new one and
+    retries the URL once, giving up after `max_restarts` restarts; if the new
+    browser will not start, the URL fails and the worker stops. Once every
+    worker has stopped, the URLs already taken from `urls` fail as well.
+    """
+
+    def __init__(self, driver_factory, extract, workers=4, rate=1.0, burst=1, max_restarts=3):
+        self.driver_factory = driver_factory
+        self.extract = extract
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self.max_restarts = max_restarts
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except (WebDriverException,) + DRIVER_CRASHES:
+            pass
+
+    def _work(self, name, url_queue, results, stop):
+        driver = None
+        restarts = 0
+        try:
+            driver = self.driver_factory()
+            while not stop.is_set():
+                url = url_queue.get()
+                if url is _DONE:
+                    break
+                for _ in range(2):
+                    self.bucket.acquire()
+                    try:
+                        results.put((url, self.extract(driver, url)))
+                        break
+                    except Exception as e:
+                        if not is_driver_crash(e) or restarts >= self.max_restarts:
+                            logging.error(f"{name}: error scraping {url}: {str(e)}")
+                            results.put((url, None))
+                            break
+                        restarts += 1
+                        logging.warning(f"{name}: browser crashed, restarting ({restarts}/{self.max_restarts})")
+                        self._quit(driver)
+                        driver = None
+                        try:
+                            driver = self.driver_factory()
+                        except Exception as e:
+                            # The URL still gets its result, so its feeder slot is released
+                            logging.error(f"{name}: browser could not be restarted, worker stopping: {str(e)}")
+                            results.put((url, None))
+                            return
+                else:
+                    results.put((url, None))
+        except Exception as e:
+            logging.error(f"{name}: worker stopped: {str(e)}")
+        finally:
+            if driver is not None:
+                self._quit(driver)
+            results.put(_DONE)
+
+    def _feed(self, urls, url_queue, slots, stop):
+        try:
+            for url in urls:
+                if stop.is_set():
+                    return
+                # At most two URLs per worker are taken from `urls` ahead of their results
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                url_queue.put(url)
+        finally:
+            for _ in range(self.workers):
+                url_queue.put(_DONE)
+
+    def run(self, urls):
+        """Yield (url, result or None) per URL, in completion order; `urls` is consumed as workers free up."""
+        url_queue = queue.Queue()
+        results = queue.Queue()
+        stop = threading.Event()
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        feeder = threading.Thread(target=self._feed, args=(urls, url_queue, slots, stop), daemon=True)
+        feeder.start()
+
+        threads = [
+            threading.Thread(target=self._work, args=(f"worker-{i}", url_queue, results, stop), daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        running = len(threads)
+        try:
+            while running:
+                result = results.get()
+                if result is _DONE:
+                    running -= 1
+                    continue
+                slots.release()
+                yield result
+            # Every worker stopped (no browser would start): URLs already queued fail instead of vanishing
+            stop.set()
+            feeder.join()
+            while True:
+                try:
+                    url = url_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if url is not _DONE:
+                    slots.release()
+                    yield url, None
+        finally:
+            stop.set()
+            # Unblock idle workers so their browsers are shut down
+            for _ in threads:
+                url_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+
+
+class DriverPool:
+    """Long-lived Chrome instances reused across scraping cycles.
+
+    `acquire(options)` hands out an idle browser, launching one with `options`
+    only when none is warm. `release(driver, pages)` returns it; a browser is
+    recycled once it has served `max_pages` page loads, its JS heap grows past
+    `max_memory_mb`, or it is released as unhealthy, and a replacement is
+    started in the background so the next cycle does not pay for the launch.
+    `block_resources` names BLOCKED_RESOURCES categories to drop from every
+    page load. Launch times are kept for `metrics()`.
+    """
+
+    def __init__(self, max_pages=50, max_memory_mb=1024, block_resources=()):
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.block_resources = tuple(block_resources)
+        self.idle = []
+        self.pages = {}
+        self.options = None
+        self.startup_seconds = []
+        self.recycled = 0
+        self.lock = threading.Lock()
+        self.warming = None
+
+    def _launch(self, options):
+        options = copy.deepcopy(options)
+        if 'images' in self.block_resources:
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        started = time.monotonic()
+        driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+        patterns = [pattern for name in self.block_resources for pattern in BLOCKED_RESOURCES[name]]
+        if patterns:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        elapsed = time.monotonic() - started
+        with self.lock:
+            self.startup_seconds.append(elapsed)
+            self.pages[driver] = 0
+        logging.info(f"Started browser in {elapsed:.2f}s")
+        return driver
+
+    def _warm(self, options):
+        try:
+            driver = self._launch(options)
+        except WebDriverException as e:
+            logging.error(f"Could not pre-start browser: {str(e)}")
+            return
+        with self.lock:
+            self.idle.append(driver)
+
+    def acquire(self, options):
+        with self.lock:
+            self.options = options
+            warming = self.warming
+        if warming:
+            warming.join()
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return self._launch(options)
+
+    def _memory_mb(self, driver):
+        try:
+            used = driver.execute_script("return performance.memory ? performance.memory.usedJSHeapSize : 0;")
+        except (WebDriverException,) + DRIVER_CRASHES:
+            return float('inf')
+        return (used or 0) / (1024 * 1024)
+
+    def release(self, driver, pages, healthy=True):
+        """Return `driver` after `pages` page loads (driver.get calls) since it was acquired."""
+        with self.lock:
+            self.pages[driver] = self.pages.get(driver, 0) + pages
+            served = self.pages[driver]
+        if healthy and served < self.max_pages and self._memory_mb(driver) < self.max_memory_mb:
+            with self.lock:
+                self.idle.append(driver)
+            return
+
+        logging.info(f"Recycling browser after {served} pages")
+        self._quit(driver)
+        with self.lock:
+            self.pages.pop(driver, None)
+            self.recycled += 1
+            if self.options is not None:
+                self.warming = threading.Thread(target=self._warm, args=(self.options,), daemon=True)
+                self.warming.start()
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except (WebDriverException,) + DRIVER_CRASHES:
+            pass
+
+    def metrics(self):
+        with self.lock:
+            startups = list(self.startup_seconds)
+            return {
+                'browsers_started': len(startups),
+                'browsers_recycled': self.recycled,
+                'browsers_idle': len(self.idle),
+                'startup_seconds_last': startups[-1] if startups else None,
+                'startup_seconds_avg': sum(startups) / len(startups) if startups else None,
+            }
+
+    def close(self):
+        with self.lock:
+            warming = self.warming
+        if warming:
+            warming.join()
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for driver in idle:
+            self._quit(driver)
+
+
+def load_page(driver, url, wait_for=None, timeout=20):
+    """Load `url` in `driver` and return the rendered HTML once `wait_for` (a CSS selector) is present."""
+    with metrics.timer('browser_load'):
+        driver.get(url)
+    if wait_for:
+        with metrics.timer('browser_wait'):
+            WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, wait_for)))
+    return driver.page_source.encode('utf-8')
+
+
+class BrowserFetcher:
+    """Fetcher for pages that only have their content after JavaScript runs.
+
+    Pages are rendered by a DetailWorkerPool of `workers` browsers from
+    `driver_factory`, paced to `rate` page loads per second, and handed on as
+    HTML, so the same parser serves pages fetched over plain HTTP.
+    """
+
+    def __init__(self, driver_factory, wait_for=None, workers=4, rate=1.0, timeout=20):
+        self.driver_factory = driver_factory
+        self.wait_for = wait_for
+        self.workers = workers
+        self.rate = rate
+        self.timeout = timeout
+
+    def _load(self, driver, url):
+        return load_page(driver, url, self.wait_for, self.timeout)
+
+    def fetch_all(self, urls):
+        """Yield (url, HTML or None) as pages finish rendering."""
+        pool = DetailWorkerPool(self.driver_factory, self._load, workers=self.workers, rate=self.rate)
+        yield from pool.run(urls)
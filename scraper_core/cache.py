@@ -0,0 +1,244 @@
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|_trkparms|_trksid|hash|amdata)$')
+
+
+def normalize_url(url):
+    """Cache key for `url`: lowercased scheme/host, sorted query, no fragment or tracking parameters."""
+    parts = urlsplit(url)
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not TRACKING_PARAMS.match(key))
+    path = parts.path or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+class OfflineCacheMiss(requests.RequestException):
+    """Raised in offline mode for a URL that is not in the cache."""
+
+
+class ResponseCache:
+    """On-disk HTTP response cache in a single SQLite file.
+
+    Bodies are zlib-compressed and the total stored size is kept under
+    `max_bytes` by evicting least recently used entries. An entry is fresh for
+    the first `ttl` seconds matching its URL in `ttl_overrides` (a list of
+    (regex, seconds)), else `default_ttl`; stale entries are revalidated with
+    If-None-Match / If-Modified-Since. A ttl of None means always revalidate.
+
+    Hits only note their access time in memory; the times are written in one
+    batch before an eviction, on `close()` or once `ACCESS_BATCH` are pending.
+    Several processes can share the file: the total size is kept in the
+    database, updated in the same transaction as each entry.
+    """
+
+    ACCESS_BATCH = 256
+
+    def __init__(self, filename, max_bytes=512 * 1024 * 1024, default_ttl=None, ttl_overrides=()):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttl_overrides = [(re.compile(pattern), ttl) for pattern, ttl in ttl_overrides]
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        # Kept up to date by put/delete/_evict instead of summing the table on every put
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+        )
+        self.db.execute("INSERT OR IGNORE INTO cache_size VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM responses))")
+        self.db.commit()
+        self.accessed = {}  # key -> access time not yet written
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def count(self, outcome):
+        """Add one to the `outcome` counter ('hits', 'revalidated' or 'misses'); called from fetch threads."""
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttl_overrides:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url):
+        """Return the cached entry for `url` as a dict, or None."""
+        key = normalize_url(url)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT url, status, headers, body, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.accessed[key] = time.time()
+            if len(self.accessed) >= self.ACCESS_BATCH:
+                self._write_accessed()
+                self.db.commit()
+        url, status, headers, body, etag, last_modified, fetched_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': dict(line.split(': ', 1) for line in headers.splitlines() if ': ' in line),
+            'content': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+        }
+
+    def is_fresh(self, entry):
+        ttl = self.ttl_for(entry['url'])
+        return ttl is not None and time.time() - entry['fetched_at'] < ttl
+
+    def put(self, url, response):
+        body = zlib.compress(response.content)
+        headers = "\n".join(f"{name}: {value}" for name, value in response.headers.items()
+                            if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding'))
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            self.accessed.pop(key, None)
+            # The first write of the transaction, so no other process changes the entry in between
+            self.db.execute("UPDATE cache_size SET total = total + ? - "
+                            "COALESCE((SELECT size FROM responses WHERE key = ?), 0)", (len(body), key))
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, response.status_code, headers, body, len(body),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now),
+            )
+            self._evict()
+            self.db.commit()
+
+    def delete(self, url):
+        key = normalize_url(url)
+        with self.lock:
+            self.accessed.pop(key, None)
+            self.db.execute("UPDATE cache_size SET total = total - "
+                            "COALESCE((SELECT size FROM responses WHERE key = ?), 0)", (key,))
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def touch(self, url):
+        """Mark a revalidated entry as freshly fetched."""
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            self.accessed.pop(key, None)
+            self.db.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self.db.commit()
+
+    def _write_accessed(self):
+        self.db.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                            [(accessed_at, key) for key, accessed_at in self.accessed.items()])
+        self.accessed = {}
+
+    def total_size(self):
+        return self.db.execute("SELECT total FROM cache_size").fetchone()[0]
+
+    def _evict(self):
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return
+        # The least recently used order needs the pending access times
+        self._write_accessed()
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self.db.execute("UPDATE cache_size SET total = ?", (total,))
+
+    def close(self):
+        with self.lock:
+            self._write_accessed()
+            self.db.commit()
+            self.db.close()
+
+
+def _cached_response(entry):
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.url = entry['url']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = entry['content']
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+
+class CachedSession:
+    """Drop-in for the `get` of a requests.Session that goes through a ResponseCache.
+
+    `throttle(url)`, if given, is called only before requests that actually
+    go to the network, so fresh cache hits are not rate limited. With
+    `offline=True` no request is ever sent: cached URLs are replayed and
+    anything else raises OfflineCacheMiss.
+    """
+
+    def __init__(self, cache, session=None, offline=False, throttle=None):
+        self.cache = cache
+        self.session = session or requests.Session()
+        self.offline = offline
+        self.throttle = throttle
+
+    def get(self, url, headers=None, **kwargs):
+        entry = self.cache.get(url)
+        if self.offline:
+            if entry is None:
+                self.cache.count('misses')
+                raise OfflineCacheMiss(f"Not in cache: {url}")
+            self.cache.count('hits')
+            return _cached_response(entry)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.count('hits')
+            return _cached_response(entry)
+
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if self.throttle:
+            self.throttle(url)
+        response = self.session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.cache.count('revalidated')
+            self.cache.touch(url)
+            return _cached_response(entry)
+        self.cache.count('misses')
+        if response.status_code == 200:
+            self.cache.put(url, response)
+        response.from_cache = False
+        return response
+
+    def mount(self, prefix, adapter):
+        self.session.mount(prefix, adapter)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,177 @@
+"""Fetchers for Pipeline: a thread pool over one pooled requests session (PageFetcher)."""
+import copy
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+from urllib3.util.retry import Retry
+
+from scraper_core.cache import CachedSession
+from scraper_core.metrics import metrics, make_adapter, record_response
+from scraper_core.ratelimit import AdaptiveRateLimiter
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/119.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1"
+]
+
+
+def random_headers():
+    """Browser-like request headers with a random user agent, for a fetcher's `headers_factory`."""
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept-Language": "en-US, en;q=0.9",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+        "Referer": "https://www.google.com/",
+        "DNT": "1",
+        "Connection": "keep-alive",
+        "Upgrade-Insecure-Requests": "1",
+    }
+
+
+class PageFetcher:
+    """Keeps several pages in flight over one pooled session.
+
+    Concurrency is bounded globally by `max_workers` and per host by `per_host`;
+    every request also goes through a shared AdaptiveRateLimiter, which
+    starts at `rate` requests per second and speeds up or backs off per host
+    from what the server returns. 429/503 responses, pages
+    `is_blocked(content)` flags (a bot wall served with a 200) and responses
+    in `block_statuses` (such as a 403 bot wall) are retried after the
+    backoff, up to `max_attempts` tries. With a ResponseCache,
+    pages are served from and revalidated against the cache, and only real
+    network requests are rate limited; `offline=True` replays the cache
+    without touching the network.
+    """
+
+    def __init__(self, headers_factory, max_workers=8, per_host=4, rate=0.5, burst=2, timeout=15,
+                 cache=None, offline=False, is_blocked=None, block_statuses=(), max_attempts=3):
+        self.headers_factory = headers_factory
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.is_blocked = is_blocked
+        self.block_statuses = block_statuses
+        self.max_attempts = max_attempts
+        self.limiter = AdaptiveRateLimiter(rate, burst)
+        self.host_limits = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self.host_lock = threading.Lock()
+
+        self.session = requests.Session()
+        # 429/503 are left to the rate limiter so it can see them
+        retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 504],
+                        respect_retry_after_header=False)
+        adapter = make_adapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cached = cache is not None
+        if self.cached:
+            self.session = CachedSession(cache, self.session, offline=offline, throttle=self._throttle)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self.local = threading.local()
+
+    def _throttle(self, url):
+        # Called by CachedSession inside get(); the wait is kept out of the request latency
+        started = time.monotonic()
+        self.limiter.acquire(url)
+        self.local.throttled = time.monotonic() - started
+
+    def _is_blocked(self, status, content):
+        return status in self.block_statuses or (
+            status == 200 and self.is_blocked is not None and self.is_blocked(content))
+
+    def _host_limit(self, url):
+        with self.host_lock:
+            return self.host_limits[urlparse(url).netloc]
+
+    def fetch(self, url):
+        """Return the raw response body for `url`, or None if the request failed."""
+        with self._host_limit(url):
+            for attempt in range(1, self.max_attempts + 1):
+                if not self.cached:
+                    self.limiter.acquire(url)
+                try:
+                    logging.info(f"Fetching page: {url}")
+                    started = time.monotonic()
+                    self.local.throttled = 0.0
+                    response = self.session.get(url, headers=self.headers_factory(), timeout=self.timeout)
+                except requests.RequestException as e:
+                    logging.error(f"Error fetching {url}: {str(e)}")
+                    return None
+                seconds = time.monotonic() - started - self.local.throttled
+                if getattr(response, 'from_cache', False):
+                    metrics.inc('cache_hits')
+                    return response.content
+                metrics.observe('fetch', seconds)
+                record_response(response, seconds)
+
+                blocked = self._is_blocked(response.status_code, response.content)
+                if blocked and self.cached:
+                    self.session.cache.delete(url)
+                self.limiter.record(url, response.status_code, seconds, response.headers.get('Retry-After'), blocked)
+                if blocked or response.status_code in self.limiter.THROTTLE_STATUSES:
+                    metrics.inc('throttled_retries')
+                    logging.warning(f"Throttled on {url} (attempt {attempt}/{self.max_attempts})")
+                    continue
+                try:
+                    response.raise_for_status()
+                except requests.RequestException as e:
+                    logging.error(f"Error fetching {url}: {str(e)}")
+                    return None
+                return response.content
+            return None
+
+    def fetch_all(self, urls):
+        """Yield (url, content) pairs as they complete, with at most `max_workers` requests in flight.
+
+        `urls` is consumed lazily, so closing the generator early stops further
+        requests from being issued.
+        """
+        urls = iter(urls)
+        pending = {}
+        try:
+            for url in urls:
+                pending[self.executor.submit(self.fetch, url)] = url
+                if len(pending) >= self.max_workers:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    yield url, future.result()
+                    next_url = next(urls, None)
+                    if next_url is not None:
+                        pending[self.executor.submit(self.fetch, next_url)] = next_url
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shared(self, max_workers):
+        """A view of this fetcher with its own `max_workers` cap on requests in flight.
+
+        It uses the same pool, session, cache and rate limits, so a second
+        pipeline can run next to the first one within the same politeness
+        budget. Close the original fetcher, not the view.
+        """
+        view = copy.copy(self)
+        view.max_workers = max_workers
+        return view
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
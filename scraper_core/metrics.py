@@ -0,0 +1,241 @@
+import bisect
+import cProfile
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the `fraction` quantile."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Per-stage latency histograms and counters for one scraper run.
+
+    `timer(stage)` is a context manager that records how long its block took
+    into the stage's histogram; `inc(name, amount)` bumps a counter. Both are
+    thread-safe. While disabled they cost one attribute check: `timer` hands
+    back a shared no-op context. Export with `prometheus()` or `write_jsonl()`.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def enable(self):
+        """Start recording; counters and rates then accumulate until the process exits."""
+        if not self.enabled:
+            self.enabled = True
+            self.started = time.time()
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.time() - self.started
+            return {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'elapsed_seconds': round(elapsed, 3),
+                'counters': dict(self.counters),
+                'rates': {name: round(value / elapsed, 3) for name, value in self.counters.items()
+                          if name.startswith('records') and elapsed > 0},
+                'stages': {
+                    stage: {
+                        'count': histogram.count,
+                        'sum_seconds': round(histogram.sum, 6),
+                        'mean_ms': round(histogram.sum / histogram.count * 1000, 3),
+                        'p50_ms_le': histogram.quantile(0.5) * 1000,
+                        'p99_ms_le': histogram.quantile(0.99) * 1000,
+                    }
+                    for stage, histogram in self.histograms.items()
+                },
+            }
+
+    def prometheus(self, prefix='scraper'):
+        """Render every histogram and counter in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                lines.append(f"{prefix}_{name} {value}")
+            if self.histograms:
+                lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, filename):
+        with open(filename, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def export(self, filename):
+        """Write Prometheus text to a .prom file, otherwise append a JSON line."""
+        if filename.endswith('.prom'):
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+        else:
+            self.write_jsonl(filename)
+
+
+# Shared by every module of a run; scripts enable it from the command line
+metrics = Metrics()
+
+
+@contextmanager
+def profiled(filename=None):
+    """Run the block under cProfile and dump the stats to `filename` (no-op when it is None).
+
+    Hot loops are kept in named functions so the profile, or py-spy attached
+    to the process, attributes time to them directly.
+    """
+    if not filename:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filename)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """Records the DNS lookup plus TCP connect of every new connection."""
+
+    connect_seconds = 0.0
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self.connect_seconds = time.perf_counter() - started
+            metrics.observe('connect', self.connect_seconds)
+            metrics.inc('connections_opened')
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    """Also records the TLS handshake that follows the connect."""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        metrics.observe('tls', max(0.0, time.perf_counter() - started - self.connect_seconds))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report their connect and TLS times to `metrics`."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+def make_adapter(**kwargs):
+    """HTTPAdapter for a scraper session: timed while metrics are enabled, plain otherwise."""
+    return TimedAdapter(**kwargs) if metrics.enabled else HTTPAdapter(**kwargs)
+
+
+def record_response(response, seconds):
+    """Split a completed request into time to first byte and download time, and count bytes and retries."""
+    if not metrics.enabled:
+        return
+    ttfb = response.elapsed.total_seconds()
+    metrics.observe('ttfb', ttfb)
+    metrics.observe('download', max(0.0, seconds - ttfb))
+    metrics.inc('bytes_downloaded', len(response.content))
+    metrics.inc('requests')
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None and retries.history:
+        metrics.inc('retries', len(retries.history))
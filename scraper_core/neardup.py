@@ -0,0 +1,359 @@
+"""Near-duplicate detection with MinHash signatures and LSH banding.
+
+Records are reduced to a normalized text (lowercased, punctuation and
+extra whitespace removed), cut into overlapping byte shingles and
+summarized by a MinHash signature, whose agreement estimates the Jaccard
+similarity of two shingle sets. Signatures are split into bands; records
+sharing any band are candidates, and only candidates are compared, so a
+lookup costs the same against a thousand stored records as against
+millions.
+
+Clean an existing CSV in place (first occurrence wins), from the repository root:
+    python -m scraper_core.neardup ebay ebay_scrape/ebay_data.csv
+    python -m scraper_core.neardup zomato_cards zomato_scrape/zomato_data.csv --threshold 0.85 --dry-run
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from scraper_core.metrics import metrics
+from scraper_core.normalize import NUMBER
+from scraper_core.sinks import first_number
+
+# Dataset -> text fields, similarity threshold, and optionally a number
+# (price) that must also agree within a relative tolerance
+DATASETS = {
+    'ebay': {
+        'fields': ['PRODUCT NAME'],
+        'threshold': 0.85,
+        'number': 'PRICE',
+        'tolerance': 0.05,
+        'strip': r'^\s*new listing\b',
+    },
+    'zomato_cards': {'fields': ['name', 'location'], 'threshold': 0.9},
+    'zomato_details': {'fields': ['name', 'address'], 'threshold': 0.9},
+}
+
+SHINGLE = 4  # bytes per shingle
+NUM_PERM = 64
+CHUNK = 1024  # texts hashed per numpy batch
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_NON_WORD = re.compile(r'[\W_]+')
+_NUMBER = re.compile(NUMBER)
+
+
+def band_params(threshold, num_perm=NUM_PERM):
+    """(bands, rows) with bands * rows == num_perm, S-curve midpoint (1/bands)^(1/rows) as high as `threshold` allows.
+
+    Keeping the midpoint at or below the threshold favours recall: pairs
+    above the threshold nearly always share a band, and the extra
+    candidates are weeded out by comparing full signatures.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    return max(below or options[:1], key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+class MinHasher:
+    """MinHash signatures of byte-shingled texts, computed for a batch of texts at a time with numpy."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Multiply-shift hashes: odd multipliers, keeping the high 32 bits
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def _shingles(self, texts):
+        """Shingle values of every text, concatenated, and where each text's shingles start."""
+        encoded = [text.encode('utf-8') for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        count = len(data) - SHINGLE + 1
+        values = data[:count].copy()
+        for offset in range(1, SHINGLE):
+            values = (values << np.uint64(8)) | data[offset:offset + count]
+        # Drop the shingles that straddle two texts
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        text_of = np.repeat(np.arange(len(encoded)), lengths)[:count]
+        values = values[np.arange(count) - starts[text_of] <= lengths[text_of] - SHINGLE]
+        shingle_counts = lengths - SHINGLE + 1
+        return values, np.concatenate(([0], np.cumsum(shingle_counts)[:-1]))
+
+    def signatures(self, texts):
+        """(len(texts), num_perm) uint32 signatures; every text must be at least SHINGLE bytes long."""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        with np.errstate(over='ignore'):
+            for start in range(0, len(texts), CHUNK):
+                values, offsets = self._shingles(texts[start:start + CHUNK])
+                values *= _MIX
+                hashes = np.empty_like(values)
+                # One permutation at a time, in place: a (num_perm, shingles) matrix would not stay in cache
+                for perm in range(self.num_perm):
+                    np.multiply(values, self.a[perm], out=hashes)
+                    hashes += self.b[perm]
+                    hashes >>= np.uint64(32)
+                    result[start:start + CHUNK, perm] = np.minimum.reduceat(hashes, offsets)
+        return result
+
+
+def _clean(text, strip):
+    text = text.lower()
+    if strip:
+        text = strip.sub(' ', text)
+    # Padded so even an empty text has one shingle
+    return _NON_WORD.sub(' ', text).strip().ljust(SHINGLE)
+
+
+class NearDuplicateIndex:
+    """Streaming near-duplicate filter for one dataset (a DATASETS entry).
+
+    `add(record)` is False when a record with at least `threshold`
+    estimated similarity (and, if the dataset has one, a number within its
+    tolerance) was added before, and otherwise remembers the record and
+    returns True, so the index can be given to a Pipeline as `seen`.
+    Existing data is loaded in bulk into sorted per-band arrays searched by
+    bisection; records added afterwards go to per-band dicts, merged into
+    the arrays once they grow large.
+    """
+
+    def __init__(self, dataset, threshold=None, num_perm=NUM_PERM):
+        self.spec = DATASETS[dataset]
+        self.threshold = threshold or self.spec['threshold']
+        self.bands, self.rows = band_params(self.threshold, num_perm)
+        self.hasher = MinHasher(num_perm)
+        self.strip = re.compile(self.spec['strip']) if self.spec.get('strip') else None
+        self.band_mix = np.random.default_rng(2).integers(1, 2 ** 63, size=self.rows, dtype=np.uint64)
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self.numbers = np.empty(0, dtype=np.float64)
+        self.count = 0
+        self.sorted_keys = [np.empty(0, dtype=np.uint64) for _ in range(self.bands)]
+        self.sorted_ids = [np.empty(0, dtype=np.int64) for _ in range(self.bands)]
+        self.recent = [{} for _ in range(self.bands)]
+
+    def __len__(self):
+        return self.count
+
+    def texts(self, df):
+        """Normalized texts of the DataFrame `df`, vectorized (the batch counterpart of `_text`)."""
+        text = df[self.spec['fields'][0]].fillna("").astype(str)
+        for field in self.spec['fields'][1:]:
+            text = text + " " + df[field].fillna("").astype(str)
+        text = text.str.lower()
+        if self.strip:
+            text = text.str.replace(self.strip, " ", regex=True)
+        return text.str.replace(_NON_WORD, " ", regex=True).str.strip().str.ljust(SHINGLE).tolist()
+
+    def _text(self, record):
+        return _clean(" ".join(str(record.get(field) or "") for field in self.spec['fields']), self.strip)
+
+    def _number(self, record):
+        match = _NUMBER.search(str(record.get(self.spec['number']) or "")) if 'number' in self.spec else None
+        return float(match.group('number').replace(",", "")) if match else np.nan
+
+    def numbers_of(self, df):
+        if 'number' not in self.spec:
+            return np.full(len(df), np.nan)
+        return first_number(df[self.spec['number']]).to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def _band_keys(self, signatures):
+        """(len(signatures), bands) uint64 keys, one hash per band of each signature."""
+        blocks = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over='ignore'):
+            return (blocks * self.band_mix).sum(axis=2)
+
+    def _append(self, signatures, numbers):
+        needed = self.count + len(signatures)
+        if needed > len(self.signatures):
+            capacity = max(needed, 2 * len(self.signatures), 1024)
+            grown = np.empty((capacity, self.hasher.num_perm), dtype=np.uint32)
+            grown[:self.count] = self.signatures[:self.count]
+            self.signatures = grown
+            self.numbers = np.resize(self.numbers, capacity)
+        ids = np.arange(self.count, needed)
+        self.signatures[ids] = signatures
+        self.numbers[ids] = numbers
+        self.count = needed
+        return ids
+
+    def _matches(self, signature, number, candidates):
+        """Candidate ids similar enough to `signature` (and `number`)."""
+        similarity = (self.signatures[candidates] == signature).mean(axis=1)
+        similar = similarity >= self.threshold
+        if 'number' in self.spec and not np.isnan(number):
+            stored = self.numbers[candidates]
+            close = np.isnan(stored) | (np.abs(stored - number) <= self.spec['tolerance'] * np.maximum(stored, number))
+            similar &= close
+        return candidates[similar]
+
+    def _candidates(self, keys):
+        found = []
+        for band, key in enumerate(keys):
+            keys_sorted = self.sorted_keys[band]
+            low, high = np.searchsorted(keys_sorted, key, side='left'), np.searchsorted(keys_sorted, key, side='right')
+            if high > low:
+                found.append(self.sorted_ids[band][low:high])
+            recent = self.recent[band].get(int(key))
+            if recent is not None:
+                found.append(np.asarray(recent, dtype=np.int64))
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def find(self, record):
+        """Id of an earlier near-duplicate of `record`, or None."""
+        signature = self.hasher.signatures([self._text(record)])[0]
+        return self._find(signature, self._number(record), self._band_keys(signature[None, :])[0])
+
+    def _find(self, signature, number, keys):
+        candidates = self._candidates(keys)
+        if not len(candidates):
+            return None
+        matches = self._matches(signature, number, candidates)
+        return int(matches[0]) if len(matches) else None
+
+    def add(self, record):
+        signature = self.hasher.signatures([self._text(record)])[0]
+        number = self._number(record)
+        keys = self._band_keys(signature[None, :])[0]
+        if self._find(signature, number, keys) is not None:
+            metrics.inc('near_duplicates')
+            return False
+        record_id = int(self._append(signature[None, :], [number])[0])
+        for band, key in enumerate(keys):
+            self.recent[band].setdefault(int(key), []).append(record_id)
+        if len(self.recent[0]) >= 65536:
+            self._merge_recent()
+        return True
+
+    def _merge_recent(self):
+        for band in range(self.bands):
+            pairs = [(key, record_id) for key, ids in self.recent[band].items() for record_id in ids]
+            keys = np.concatenate((self.sorted_keys[band], np.array([key for key, _ in pairs], dtype=np.uint64)))
+            ids = np.concatenate((self.sorted_ids[band], np.array([i for _, i in pairs], dtype=np.int64)))
+            order = np.argsort(keys, kind='stable')
+            self.sorted_keys[band], self.sorted_ids[band] = keys[order], ids[order]
+            self.recent[band] = {}
+
+    def _index_bulk(self, ids, keys):
+        for band in range(self.bands):
+            band_keys = np.concatenate((self.sorted_keys[band], keys[:, band]))
+            band_ids = np.concatenate((self.sorted_ids[band], ids))
+            order = np.argsort(band_keys, kind='stable')
+            self.sorted_keys[band], self.sorted_ids[band] = band_keys[order], band_ids[order]
+
+    def extend(self, df):
+        """Add every row of `df` without checking for duplicates (for data already stored); vectorized."""
+        if df.empty:
+            return
+        signatures = self.hasher.signatures(self.texts(df))
+        ids = self._append(signatures, self.numbers_of(df))
+        self._index_bulk(ids, self._band_keys(signatures))
+
+    def duplicates(self, df):
+        """For each row of `df`, the position of the earlier row it duplicates, or -1 (the batch mode).
+
+        Rows are only compared with the first row of each LSH bucket they
+        fall in, which keeps this vectorized; chains (A ~ B ~ C) are followed
+        back to their first row.
+        """
+        signatures = self.hasher.signatures(self.texts(df))
+        numbers = self.numbers_of(df)
+        keys = self._band_keys(signatures)
+        positions = np.arange(len(df))
+        parent = positions.copy()
+        for band in range(self.bands):
+            _, first, inverse = np.unique(keys[:, band], return_index=True, return_inverse=True)
+            representative = first[inverse.ravel()]
+            pairs = np.flatnonzero(representative != positions)
+            other = representative[pairs]
+            similar = (signatures[pairs] == signatures[other]).mean(axis=1) >= self.threshold
+            if 'number' in self.spec:
+                mine, theirs = numbers[pairs], numbers[other]
+                similar &= (np.isnan(mine) | np.isnan(theirs)
+                            | (np.abs(mine - theirs) <= self.spec['tolerance'] * np.fmax(mine, theirs)))
+            np.minimum.at(parent, pairs[similar], other[similar])
+        # Follow chains to the earliest row; parents always point backwards
+        while True:
+            followed = parent[parent]
+            if np.array_equal(followed, parent):
+                break
+            parent = followed
+        return np.where(parent == positions, -1, parent)
+
+    def save(self, filename):
+        tmp_filename = filename + ".tmp.npz"
+        np.savez(tmp_filename, signatures=self.signatures[:self.count], numbers=self.numbers[:self.count],
+                 threshold=self.threshold)
+        os.replace(tmp_filename, filename)
+
+    def load(self, filename):
+        """Load a saved index; False if it is missing or was built with another threshold or signature size."""
+        if not os.path.exists(filename):
+            return False
+        with np.load(filename) as saved:
+            if float(saved['threshold']) != self.threshold or saved['signatures'].shape[1] != self.hasher.num_perm:
+                return False
+            signatures, numbers = saved['signatures'], saved['numbers']
+        ids = self._append(signatures, numbers)
+        self._index_bulk(ids, self._band_keys(signatures))
+        return True
+
+
+class SinkNearDuplicates(NearDuplicateIndex):
+    """NearDuplicateIndex over the records of a sink, kept in a sidecar file next to the data.
+
+    Like ebay_scrape's KeyIndex, the sidecar is rebuilt from the sink's
+    columns whenever it is missing or older than the data, and is written
+    back on `close()`, which should come after the sink is closed.
+    """
+
+    def __init__(self, sink, dataset, threshold=None, num_perm=NUM_PERM):
+        super().__init__(dataset, threshold, num_perm)
+        self.sink = sink
+        self.index_filename = sink.path.rstrip(os.sep) + '.minhash.npz'
+        last_modified = sink.last_modified()
+        fresh = os.path.exists(self.index_filename) and os.path.getmtime(self.index_filename) >= last_modified
+        if not (fresh and self.load(self.index_filename)) and last_modified:
+            columns = self.spec['fields'] + ([self.spec['number']] if 'number' in self.spec else [])
+            self.extend(sink.read_columns(columns))
+
+    def close(self):
+        self.save(self.index_filename)
+
+
+def clean_csv(csv_filename, dataset, threshold=None, dry_run=False, report=None):
+    """Drop near-duplicate rows of an existing CSV (keeping the first of each), replacing it atomically.
+
+    `report`, if given, is a CSV written with every dropped row and the row
+    number it duplicates. Returns (rows, dropped).
+    """
+    df = pd.read_csv(csv_filename, dtype=str, keep_default_na=False, na_values=[""])
+    duplicate_of = NearDuplicateIndex(dataset, threshold).duplicates(df)
+    dropped = duplicate_of >= 0
+    if report:
+        df[dropped].assign(**{'duplicate of row': duplicate_of[dropped]}).to_csv(report, index_label='row')
+    if not dry_run and dropped.any():
+        tmp_filename = csv_filename + ".tmp"
+        df[~dropped].to_csv(tmp_filename, index=False)
+        os.replace(tmp_filename, csv_filename)
+    return len(df), int(dropped.sum())
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Remove near-duplicate rows from a scraped CSV")
+    arg_parser.add_argument('dataset', choices=list(DATASETS))
+    arg_parser.add_argument('csv_filename')
+    arg_parser.add_argument('--threshold', type=float, help="similarity (0-1) above which rows count as duplicates "
+                                                             "(default: per dataset)")
+    arg_parser.add_argument('--dry-run', action='store_true', help="only count the near-duplicates")
+    arg_parser.add_argument('--report', metavar='PATH', help="write the dropped rows to this CSV")
+    args = arg_parser.parse_args()
+
+    started = time.perf_counter()
+    rows, dropped = clean_csv(args.csv_filename, args.dataset, args.threshold, args.dry_run, args.report)
+    action = "Found" if args.dry_run else "Dropped"
+    print(f"{action} {dropped} near-duplicates among {rows} rows of {args.csv_filename} "
+          f"in {time.perf_counter() - started:.2f}s")
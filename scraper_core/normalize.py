@@ -0,0 +1,156 @@
+"""Typed columns parsed from the raw text the scrapers store.
+
+Backfill an existing CSV in place, from the repository root:
+    python -m scraper_core.normalize ebay ebay_scrape/ebay_data.csv
+    python -m scraper_core.normalize zomato_details zomato_scrape/zomato_data.csv
+"""
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+from pandas.api.extensions import take
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # falls back to pandas' own (slower) regex extraction
+    pa = None
+    pc = None
+
+CURRENCY_SYMBOL = r"(?:[A-Z]{1,3} ?\$|\$|£|€|₹|Rs\.?|INR|USD|GBP|EUR)"
+PRICE_RANGE = (
+    rf"(?P<currency>{CURRENCY_SYMBOL})?\s*(?P<low>\d[\d,]*(?:\.\d+)?)"
+    rf"(?:\s*(?:to|-|–)\s*{CURRENCY_SYMBOL}?\s*(?P<high>\d[\d,]*(?:\.\d+)?))?"
+)
+CURRENCIES = {
+    '$': 'USD', 'US $': 'USD', 'US$': 'USD', 'USD': 'USD',
+    'C $': 'CAD', 'C$': 'CAD', 'AU $': 'AUD', 'AU$': 'AUD',
+    '£': 'GBP', 'GBP': 'GBP', '€': 'EUR', 'EUR': 'EUR',
+    '₹': 'INR', 'Rs': 'INR', 'Rs.': 'INR', 'INR': 'INR',
+}
+NUMBER = r"(?P<number>\d[\d,]*(?:\.\d+)?)"
+COUNT = rf"{NUMBER}\s*(?P<suffix>[KkMm])?"
+COUNT_SUFFIXES = {'K': 1e3, 'k': 1e3, 'M': 1e6, 'm': 1e6}
+
+# Raw column -> (kind, output columns) for each dataset
+DATASETS = {
+    'ebay': {
+        'PRICE': ('price', ['PRICE MIN', 'PRICE MAX', 'CURRENCY']),
+        'SELLER RATING': ('number', ['SELLER RATING VALUE']),
+        'RATING COUNT': ('count', ['RATING COUNT VALUE']),
+    },
+    'zomato_details': {
+        'price': ('price', ['price min', 'price max', 'currency']),
+        'dining rating': ('number', ['dining rating value']),
+        'dining reviews': ('count', ['dining reviews value']),
+    },
+    'zomato_cards': {
+        'price': ('price', ['price min', 'price max', 'currency']),
+        'rating': ('number', ['rating value']),
+    },
+}
+KIND_TYPES = {'price': ['float', 'float', 'string'], 'number': ['float'], 'count': ['int']}
+
+
+def _by_unique(series, parse):
+    """Parse each distinct value once and spread the results back over the rows.
+
+    Scraped columns repeat heavily (the same prices, ratings and counts), so
+    this is much cheaper than running the string ops on every row.
+    """
+    codes, uniques = pd.factorize(series.astype("string"))
+    parsed = parse(pd.Series(uniques, dtype="string"))
+    if isinstance(parsed, pd.Series):
+        parsed = parsed.to_frame()
+    # Missing values have code -1, which take() fills with NA
+    return pd.DataFrame(
+        {name: take(parsed[name].array, codes, allow_fill=True) for name in parsed.columns},
+        index=series.index,
+    )
+
+
+def _extract(uniques, pattern):
+    """`uniques.str.extract(pattern)` (named groups only), run by Arrow's RE2 engine when pyarrow is installed."""
+    if pc is None:
+        return uniques.str.extract(pattern)
+    # flatten() keeps rows without a match null; RE2 gives unmatched optional groups as ""
+    groups = pc.extract_regex(pa.array(uniques, type=pa.string(), from_pandas=True), pattern).flatten()
+    names = re.findall(r"\(\?P<(\w+)>", pattern)
+    return pd.DataFrame({
+        name: pd.Series(pd.arrays.ArrowStringArray(pc.if_else(pc.equal(group, ""), None, group)))
+        for name, group in zip(names, groups)
+    })
+
+
+def _numbers(text):
+    # The patterns only capture digits, commas and a decimal part, so the cast cannot fail
+    return text.str.replace(",", "", regex=False).astype("Float64")
+
+
+def _parse_prices(uniques):
+    parts = _extract(uniques, PRICE_RANGE)
+    low = _numbers(parts['low'])
+    high = _numbers(parts['high']).fillna(low)
+    symbol = parts['currency'].str.strip()
+    currency = symbol.map(CURRENCIES).fillna(symbol).astype("string")
+    return pd.DataFrame({'min': low, 'max': high, 'currency': currency})
+
+
+def _parse_numbers(uniques):
+    return _numbers(_extract(uniques, NUMBER)['number']).rename('value')
+
+
+def _parse_counts(uniques):
+    parts = _extract(uniques, COUNT)
+    scale = parts['suffix'].map(COUNT_SUFFIXES).fillna(1.0).astype("float64")
+    return (_numbers(parts['number']) * scale).round().astype("Int64").rename('value')
+
+
+PARSERS = {'price': _parse_prices, 'number': _parse_numbers, 'count': _parse_counts}
+
+
+def normalize(df, spec):
+    """Return `df` with the typed columns of `spec` (a DATASETS entry) added; missing raw columns are skipped."""
+    df = df.copy()
+    for column, (kind, outputs) in spec.items():
+        if column not in df.columns:
+            continue
+        parsed = _by_unique(df[column], PARSERS[kind])
+        for output, values in zip(outputs, parsed.columns):
+            df[output] = parsed[values]
+    return df
+
+
+def column_types(spec):
+    """Sink `types` for the columns `spec` adds."""
+    return {output: kind_type for kind, outputs in spec.values()
+            for output, kind_type in zip(outputs, KIND_TYPES[kind])}
+
+
+def normalizer(dataset):
+    """Batch function for a sink's `normalize` hook."""
+    spec = DATASETS[dataset]
+    return lambda df: normalize(df, spec)
+
+
+def backfill_csv(csv_filename, dataset):
+    """Add (or recompute) the typed columns of an existing CSV, replacing it atomically."""
+    df = pd.read_csv(csv_filename, dtype=str, keep_default_na=False, na_values=[""])
+    df = normalize(df, DATASETS[dataset])
+    tmp_filename = csv_filename + ".tmp"
+    df.to_csv(tmp_filename, index=False)
+    os.replace(tmp_filename, csv_filename)
+    return len(df)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Add typed price/rating/count columns to a scraped CSV")
+    arg_parser.add_argument('dataset', choices=list(DATASETS))
+    arg_parser.add_argument('csv_filename')
+    args = arg_parser.parse_args()
+
+    started = time.perf_counter()
+    rows = backfill_csv(args.csv_filename, args.dataset)
+    print(f"Normalized {rows} rows of {args.csv_filename} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,240 @@
+"""Fetch -> parse -> dedup -> sink, as a chain of generators.
+
+A site only describes what is specific to it (see Site); fetching, pooling,
+caching, rate control, parsing in worker processes, dedup, batching and
+metrics come from the pipeline and the fetcher it is given. Each stage pulls
+from the one before it and holds a bounded amount of work, so a slow stage
+stalls the ones upstream instead of letting pages pile up in memory:
+fetchers only take the next URL once a result has been consumed, worker
+processes get at most two pages each, and StreamingSink.write blocks while
+its buffer is full.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from scraper_core.metrics import metrics
+
+_DONE = object()
+
+
+class Site:
+    """What a scraper needs to say about one site.
+
+    `urls()` yields the pages to fetch. It is consumed lazily, so it may
+    depend on what has been scraped so far (a crawl frontier, searches that
+    ran out of results). `parse(url, content, timings)` turns a fetched page
+    into (records, more), where `more` is false on the last page of a listing;
+    records are None for a page it could not make sense of, which is then
+    handed to `page_failed` rather than `page_done`. It may fill `timings`
+    with stage -> seconds. With `parse_workers` it runs
+    in worker processes and must then be picklable (a module-level function
+    or a functools.partial of one), not a method of a site holding files or
+    connections. `key(record)` identifies duplicates (None keeps the record).
+    `page_done` and `page_failed` are called for every page in the main
+    process, for bookkeeping such as marking frontier pages done.
+    """
+
+    def urls(self):
+        raise NotImplementedError
+
+    def parse(self, url, content, timings):
+        raise NotImplementedError
+
+    def key(self, record):
+        return None
+
+    def page_done(self, url, records, more):
+        pass
+
+    def page_failed(self, url):
+        pass
+
+
+class KeySet:
+    """In-memory duplicate filter: `add(record)` is True the first time its `key(record)` is seen.
+
+    Any object with the same `add` (such as a persistent key index) can be
+    given to a Pipeline instead.
+    """
+
+    def __init__(self, key, keys=()):
+        self.key = key
+        self.keys = set(keys)
+
+    def add(self, record):
+        key = self.key(record)
+        if key is None:
+            return True
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class AllNew:
+    """Chains duplicate filters: a record is new only if every filter's `add` says so, asked in order.
+
+    Cheap exact filters should come first, so records they reject never
+    reach the slower ones (such as a near-duplicate index).
+    """
+
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def add(self, record):
+        return all(seen.add(record) for seen in self.filters)
+
+
+def _parse_timed(parse, url, content):
+    # Worker processes have their own metrics, so timings travel back with the result
+    timings = {}
+    started = time.perf_counter()
+    records, more = parse(url, content, timings)
+    if not timings:
+        timings['parse'] = time.perf_counter() - started
+    return records, more, timings
+
+
+class Pipeline:
+    """Runs a Site through `fetcher` (anything with `fetch_all(urls)` yielding (url, content or None)).
+
+    New records go to `sink`, filtered through `seen` (default: a KeySet on
+    `site.key`). Pages are parsed in this process, or in `parse_workers`
+    worker processes for CPU-heavy parsers; `limit` caps the new records.
+    """
+
+    def __init__(self, site, fetcher, sink=None, seen=None, parse_workers=0, limit=None, queue_size=32):
+        self.site = site
+        self.fetcher = fetcher
+        self.sink = sink
+        self.seen = seen if seen is not None else KeySet(site.key)
+        self.parse_workers = parse_workers
+        self.limit = limit
+        self.queue_size = queue_size
+        self.pages = 0
+        self.collected = 0
+
+    def _fetched(self):
+        for url, content in self.fetcher.fetch_all(self.site.urls()):
+            if content is None:
+                self.site.page_failed(url)
+                continue
+            yield url, content
+
+    def _parsed_inline(self, pages):
+        try:
+            for url, content in pages:
+                yield (url,) + _parse_timed(self.site.parse, url, content)
+        finally:
+            pages.close()
+
+    def _feed(self, pages, raw_queue, stop):
+        try:
+            for item in pages:
+                while not stop.is_set():
+                    try:
+                        raw_queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+        except Exception as e:
+            logging.error(f"Fetching stopped: {str(e)}")
+        finally:
+            pages.close()
+            raw_queue.put(_DONE)
+
+    def _parsed_in_processes(self, pages):
+        """A feeder thread pulls fetched pages onto a bounded queue while worker processes parse them."""
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        feeder = threading.Thread(target=self._feed, args=(pages, raw_queue, stop), daemon=True)
+        feeder.start()
+
+        max_in_flight = self.parse_workers * 2
+        pending = {}
+        feeding = True
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            try:
+                while feeding or pending:
+                    while feeding and len(pending) < max_in_flight:
+                        try:
+                            item = raw_queue.get(block=not pending, timeout=None)
+                        except queue.Empty:
+                            break
+                        if item is _DONE:
+                            feeding = False
+                            break
+                        url, content = item
+                        pending[pool.submit(_parse_timed, self.site.parse, url, content)] = url
+
+                    if not pending:
+                        continue
+                    done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url = pending.pop(future)
+                        yield (url,) + future.result()
+            finally:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                # Drain so a feeder blocked on a full queue can finish
+                while feeder.is_alive():
+                    try:
+                        raw_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+
+    def _new_records(self, records):
+        new = []
+        with metrics.timer('dedup'):
+            for record in records:
+                if self.limit is not None and self.collected + len(new) >= self.limit:
+                    break
+                if self.seen.add(record):
+                    new.append(record)
+        return new
+
+    def run(self):
+        """Yield (url, new records) for every page, once they have been handed to the sink.
+
+        Stops at `limit` new records, or when the caller stops iterating;
+        either way requests still in flight are cancelled.
+        """
+        pages = self._fetched()
+        if self.parse_workers:
+            parsed = self._parsed_in_processes(pages)
+        else:
+            parsed = self._parsed_inline(pages)
+        try:
+            for url, records, more, timings in parsed:
+                for stage, seconds in timings.items():
+                    metrics.observe(stage, seconds)
+                if records is None:
+                    logging.warning(f"Could not parse {url}")
+                    metrics.inc('pages_unparsed')
+                    self.site.page_failed(url)
+                    continue
+                metrics.inc('pages_parsed')
+                self.pages += 1
+                self.site.page_done(url, records, more)
+
+                new = self._new_records(records)
+                metrics.inc('records_scraped', len(records))
+                metrics.inc('records_new', len(new))
+                if new and self.sink is not None:
+                    self.sink.write(new)
+                self.collected += len(new)
+                yield url, new
+
+                if self.limit is not None and self.collected >= self.limit:
+                    return
+        finally:
+            parsed.close()
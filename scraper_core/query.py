@@ -0,0 +1,441 @@
+"""Indexed queries over the scraped CSVs: filters, top-k and group-by without loading the data.
+
+The index of a CSV is a directory of numpy arrays next to it
+(ebay_data.csv.index/), memory-mapped when opened:
+- for each numeric field (price, rating, ...), the values by row and the
+  row ids sorted by value, for range filters and top-k;
+- for each term field (seller, location, cuisine, ...), an inverted index
+  with the rows of every term, for equality filters and group-by;
+- the byte offset of every row, so matching rows are read straight from
+  the CSV.
+Opening an index catches up with the rows the scrapers appended since it
+was written, parsing only those; a CSV rewritten in place is reindexed.
+
+Query from the repository root:
+    python -m scraper_core.query ebay ebay_scrape/ebay_data.csv --where price=:50 --where condition="brand new" --top ratings
+    python -m scraper_core.query ebay ebay_scrape/ebay_data.csv --where price=100: --group location --agg price:mean
+    python -m scraper_core.query zomato_details zomato_scrape/zomato_data.csv --where "cuisine=italian|chinese" --top rating
+"""
+import argparse
+import io
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from scraper_core.normalize import DATASETS as NORMALIZED, normalize
+
+# Dataset -> numeric fields (typed columns from scraper_core.normalize), term
+# fields (a raw column, optionally split into several terms per row and with
+# a prefix stripped) and the columns shown for matching rows
+DATASETS = {
+    'ebay': {
+        'numbers': {'price': 'PRICE MIN', 'seller_rating': 'SELLER RATING VALUE', 'ratings': 'RATING COUNT VALUE'},
+        'terms': {
+            'seller': {'column': 'SELLER'},
+            'location': {'column': 'SELLER LOCATION', 'strip': r'^\s*from\s+'},
+            'condition': {'column': 'CONDITION'},
+        },
+        'show': ['PRODUCT NAME', 'PRICE', 'CONDITION', 'SELLER', 'RATING COUNT', 'SELLER LOCATION'],
+    },
+    'zomato_details': {
+        'numbers': {'price': 'price min', 'rating': 'dining rating value', 'reviews': 'dining reviews value'},
+        'terms': {'cuisine': {'column': 'cuisine', 'split': ','}, 'location': {'column': 'location', 'split': ','}},
+        'show': ['name', 'location', 'dining rating', 'dining reviews', 'cuisine', 'price'],
+    },
+    'zomato_cards': {
+        'numbers': {'price': 'price min', 'rating': 'rating value'},
+        'terms': {'cuisine': {'column': 'cuisine', 'split': ','}, 'location': {'column': 'location', 'split': ','}},
+        'show': ['name', 'location', 'rating', 'cuisine', 'price'],
+    },
+}
+STATS = ('count', 'sum', 'mean', 'min', 'max')
+
+
+def _row_offsets(data):
+    """0 and the end of every complete CSV row in `data`, which starts at a row boundary.
+
+    A newline ends a row unless it falls inside a quoted value, that is
+    after an odd number of quotes ("" escapes count twice).
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buffer == ord('\n'))
+    quotes = np.flatnonzero(buffer == ord('"'))
+    quoted = np.searchsorted(quotes, newlines) % 2 == 1
+    return np.concatenate(([0], newlines[~quoted] + 1))
+
+
+def _merge_sorted(sorted_values, order, values, first_row):
+    """Insert `values` (rows first_row, first_row + 1, ...) into a value-sorted index; NaN sorts last."""
+    new_order = np.argsort(values, kind='stable')
+    new_sorted = values[new_order]
+    positions = np.searchsorted(sorted_values, new_sorted, side='right')
+    return np.insert(sorted_values, positions, new_sorted), np.insert(order, positions, new_order + first_row)
+
+
+def _insert_strings(strings, positions, values):
+    # np.insert would truncate longer strings to the array's width
+    return np.insert(strings.astype(np.result_type(strings, values)), positions, values)
+
+
+def term_values(series, spec):
+    """Lowercased terms of a term field (a DATASETS 'terms' entry), indexed by row position (repeated when split)."""
+    values = series.astype("string").str.lower()
+    if spec.get('strip'):
+        values = values.str.replace(spec['strip'], "", regex=True)
+    if spec.get('split'):
+        values = values.str.split(spec['split']).explode().astype("string")
+    values = values.str.replace(r"\s+", " ", regex=True).str.strip()
+    return values[values.notna() & (values != "")]
+
+
+class QueryIndex:
+    """Indexes over one scraped CSV (`dataset` is a DATASETS entry), answering queries by row id.
+
+    `select` finds the rows matching some conditions, `top` orders them by
+    a numeric field, `group` counts (and aggregates) them per term, and
+    `rows` reads rows from the CSV. The index is brought up to date when
+    opened and on `refresh()`.
+    """
+
+    def __init__(self, csv_filename, dataset):
+        self.csv_filename = csv_filename
+        self.dataset = dataset
+        self.spec = DATASETS[dataset]
+        self.directory = csv_filename.rstrip(os.sep) + '.index'
+        self.meta = None
+        self.arrays = {}
+        self._load()
+        self.refresh()
+
+    def __len__(self):
+        return self.meta['rows'] if self.meta else 0
+
+    def _array_names(self):
+        names = ['offsets']
+        for field in self.spec['numbers']:
+            names += [field, f'{field}.sorted', f'{field}.order']
+        for field in self.spec['terms']:
+            names += [f'{field}.vocab', f'{field}.vocab.sorted', f'{field}.vocab.ids', f'{field}.terms',
+                      f'{field}.rows', f'{field}.starts']
+        return names
+
+    def _load(self):
+        meta_filename = os.path.join(self.directory, 'meta.json')
+        if not os.path.exists(meta_filename):
+            return
+        with open(meta_filename) as f:
+            meta = json.load(f)
+        try:
+            arrays = {name: np.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r')
+                      for name in self._array_names()}
+        except (OSError, ValueError):
+            return
+        # Arrays of an interrupted save do not line up with the metadata
+        if meta.get('dataset') != self.dataset or len(arrays['offsets']) != meta['rows'] + 1:
+            return
+        self.meta, self.arrays = meta, arrays
+
+    def _empty(self, header, header_end):
+        self.meta = {'dataset': self.dataset, 'rows': 0, 'size': header_end, 'header_crc': zlib.crc32(header),
+                     'last_crc': 0}
+        self.arrays = {'offsets': np.array([header_end], dtype=np.int64)}
+        for field in self.spec['numbers']:
+            self.arrays[field] = self.arrays[f'{field}.sorted'] = np.empty(0, dtype=np.float64)
+            self.arrays[f'{field}.order'] = np.empty(0, dtype=np.int64)
+        for field in self.spec['terms']:
+            self.arrays[f'{field}.vocab'] = self.arrays[f'{field}.vocab.sorted'] = np.empty(0, dtype='<U1')
+            self.arrays[f'{field}.vocab.ids'] = self.arrays[f'{field}.terms'] = np.empty(0, dtype=np.int64)
+            self.arrays[f'{field}.rows'] = np.empty(0, dtype=np.int64)
+            self.arrays[f'{field}.starts'] = np.zeros(1, dtype=np.int64)
+
+    def _unchanged(self, f, header, size):
+        """Whether the indexed part of the CSV is still there as indexed (rows may have been appended)."""
+        if zlib.crc32(header) != self.meta['header_crc'] or size < self.meta['size']:
+            return False
+        if not self.meta['rows']:
+            return True
+        offsets = self.arrays['offsets']
+        f.seek(int(offsets[-2]))
+        return zlib.crc32(f.read(int(offsets[-1] - offsets[-2]))) == self.meta['last_crc']
+
+    def refresh(self):
+        """Index the rows appended to the CSV since the last refresh; returns how many there were."""
+        with open(self.csv_filename, 'rb') as f:
+            header = f.readline()
+            size = f.seek(0, os.SEEK_END)
+            if self.meta is None or not self._unchanged(f, header, size):
+                self._empty(header, len(header))
+            start = self.meta['size']
+            f.seek(start)
+            data = f.read()
+        # A row still being appended is left for the next refresh
+        ends = _row_offsets(data)
+        if len(ends) < 2:
+            return 0
+        data = data[:ends[-1]]
+        columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+        wanted = set(NORMALIZED[self.dataset]) | {spec['column'] for spec in self.spec['terms'].values()}
+        df = pd.read_csv(io.BytesIO(header + data), dtype=str, keep_default_na=False, na_values=[""],
+                         usecols=[column for column in columns if column in wanted])
+        if len(df) != len(ends) - 1:
+            raise ValueError(f"{self.csv_filename}: {len(df)} rows parsed from {len(ends) - 1} lines")
+        self._append(df, ends[1:] + start, zlib.crc32(data[ends[-2]:]))
+        self._save()
+        return len(df)
+
+    def _append(self, df, ends, last_crc):
+        first_row = self.meta['rows']
+        arrays = self.arrays
+        arrays['offsets'] = np.concatenate((arrays['offsets'], ends))
+        typed = normalize(df, NORMALIZED[self.dataset])
+        for field, column in self.spec['numbers'].items():
+            values = (pd.to_numeric(typed[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                      if column in typed.columns else np.full(len(df), np.nan))
+            arrays[field] = np.concatenate((arrays[field], values))
+            arrays[f'{field}.sorted'], arrays[f'{field}.order'] = _merge_sorted(
+                arrays[f'{field}.sorted'], arrays[f'{field}.order'], values, first_row)
+        for field, spec in self.spec['terms'].items():
+            if spec['column'] in df.columns:
+                terms = term_values(df[spec['column']], spec)
+                self._append_terms(field, terms.to_numpy(dtype=str), terms.index.to_numpy() + first_row)
+        self.meta.update(rows=first_row + len(df), size=int(ends[-1]), last_crc=last_crc)
+
+    def _append_terms(self, field, terms, rows):
+        arrays = self.arrays
+        vocab, vocab_sorted, vocab_ids = arrays[f'{field}.vocab'], arrays[f'{field}.vocab.sorted'], \
+            arrays[f'{field}.vocab.ids']
+        uniques, inverse = np.unique(terms, return_inverse=True)
+        positions = np.searchsorted(vocab_sorted, uniques)
+        known = positions < len(vocab_sorted)
+        known[known] = vocab_sorted[positions[known]] == uniques[known]
+        term_ids = np.empty(len(uniques), dtype=np.int64)
+        term_ids[known] = vocab_ids[positions[known]]
+        term_ids[~known] = len(vocab) + np.arange((~known).sum())
+        added = uniques[~known]
+        arrays[f'{field}.vocab'] = np.concatenate((vocab, added))
+        arrays[f'{field}.vocab.sorted'] = _insert_strings(vocab_sorted, positions[~known], added)
+        arrays[f'{field}.vocab.ids'] = np.insert(vocab_ids, positions[~known], term_ids[~known])
+        # Postings are sorted by (term id, row); new rows go after the old rows of their term
+        term_of = term_ids[inverse.ravel()]
+        order = np.lexsort((rows, term_of))
+        term_of, rows = term_of[order], rows[order]
+        at = np.searchsorted(arrays[f'{field}.terms'], term_of, side='right')
+        arrays[f'{field}.terms'] = np.insert(arrays[f'{field}.terms'], at, term_of)
+        arrays[f'{field}.rows'] = np.insert(arrays[f'{field}.rows'], at, rows)
+        arrays[f'{field}.starts'] = np.searchsorted(arrays[f'{field}.terms'],
+                                                    np.arange(len(arrays[f'{field}.vocab']) + 1))
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for name in self._array_names():
+            filename = os.path.join(self.directory, name + '.npy')
+            np.save(filename + '.tmp.npy', np.asarray(self.arrays[name]))
+            os.replace(filename + '.tmp.npy', filename)
+        # Written last: arrays newer than the metadata are detected by their length
+        meta_filename = os.path.join(self.directory, 'meta.json')
+        with open(meta_filename + '.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(meta_filename + '.tmp', meta_filename)
+
+    def _field(self, field):
+        if field in self.spec['numbers']:
+            return 'number'
+        if field in self.spec['terms']:
+            return 'term'
+        raise ValueError(f"Unknown field {field!r} for {self.dataset}; numeric: {', '.join(self.spec['numbers'])}, "
+                         f"terms: {', '.join(self.spec['terms'])}")
+
+    def _range(self, field, low, high):
+        sorted_values = self.arrays[f'{field}.sorted']
+        start = 0 if low is None else int(np.searchsorted(sorted_values, low, side='left'))
+        end = int(np.searchsorted(sorted_values, np.inf if high is None else high, side='right'))
+        return start, max(end, start)
+
+    def _term_ids(self, field, terms):
+        terms = [terms] if isinstance(terms, str) else terms
+        wanted = term_values(pd.Series(list(terms), dtype="string"), {}).to_numpy(dtype=str)
+        vocab_sorted = self.arrays[f'{field}.vocab.sorted']
+        positions = np.searchsorted(vocab_sorted, wanted)
+        found = positions < len(vocab_sorted)
+        found[found] = vocab_sorted[positions[found]] == wanted[found]
+        return np.asarray(self.arrays[f'{field}.vocab.ids'][positions[found]])
+
+    def _postings(self, field, term_ids):
+        starts, rows = self.arrays[f'{field}.starts'], self.arrays[f'{field}.rows']
+        return [rows[starts[term]:starts[term + 1]] for term in term_ids]
+
+    def _size(self, field, value):
+        """Rows matching one condition, from the index alone."""
+        if self._field(field) == 'number':
+            start, end = self._range(field, *value)
+            return end - start
+        starts = self.arrays[f'{field}.starts']
+        return int((starts[value + 1] - starts[value]).sum())
+
+    def _lookup(self, field, value):
+        if self._field(field) == 'number':
+            start, end = self._range(field, *value)
+            return np.sort(self.arrays[f'{field}.order'][start:end])
+        postings = self._postings(field, value)
+        return np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int64)
+
+    def _check(self, field, value, ids):
+        if self._field(field) == 'number':
+            low, high = value
+            values = self.arrays[field][ids]
+            keep = ~np.isnan(values)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            return keep
+        mask = np.zeros(len(self), dtype=bool)
+        for rows in self._postings(field, value):
+            mask[rows] = True
+        return mask[ids]
+
+    def select(self, conditions=None):
+        """Sorted ids of the rows matching every condition (all rows without conditions).
+
+        `conditions` maps numeric fields to (low, high), either of which may
+        be None, and term fields to a term or a list of terms (any of them).
+        The condition matching the fewest rows is read from its index; the
+        others are only checked on those rows.
+        """
+        if not conditions:
+            return np.arange(len(self))
+        plans = []
+        for field, value in conditions.items():
+            if self._field(field) == 'term':
+                value = self._term_ids(field, value)
+            plans.append((self._size(field, value), field, value))
+        plans.sort(key=lambda plan: plan[0])
+        _, field, value = plans[0]
+        ids = self._lookup(field, value)
+        for _, field, value in plans[1:]:
+            ids = ids[self._check(field, value, ids)]
+        return ids
+
+    def top(self, field, k=10, conditions=None, ascending=False):
+        """Ids of the `k` matching rows with the highest (or lowest) `field`, in order; rows without a value are left out."""
+        if self._field(field) != 'number':
+            raise ValueError(f"{field!r} is not a numeric field")
+        if not conditions:
+            # Straight from the sorted index, where NaN comes last
+            valid = int(np.searchsorted(self.arrays[f'{field}.sorted'], np.inf, side='right'))
+            order = self.arrays[f'{field}.order']
+            return np.array(order[:min(k, valid)] if ascending else order[max(valid - k, 0):valid][::-1])
+        ids = self.select(conditions)
+        values = self.arrays[field][ids]
+        keep = ~np.isnan(values)
+        ids, values = ids[keep], values[keep]
+        if not ascending:
+            values = -values
+        if len(ids) > k:
+            part = np.argpartition(values, k)[:k]
+            ids, values = ids[part], values[part]
+        return ids[np.argsort(values, kind='stable')]
+
+    def group(self, by, conditions=None, field=None, stat='count'):
+        """Matching rows per term of `by`, most frequent first, with `stat` of the numeric `field` if given.
+
+        A row with several terms (cuisines) counts towards each of them.
+        """
+        if self._field(by) != 'term':
+            raise ValueError(f"{by!r} is not a term field")
+        if stat not in STATS:
+            raise ValueError(f"Unknown stat {stat!r}; one of {', '.join(STATS)}")
+        vocab = self.arrays[f'{by}.vocab']
+        terms, rows = self.arrays[f'{by}.terms'], self.arrays[f'{by}.rows']
+        if conditions:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[self.select(conditions)] = True
+            keep = mask[rows]
+            terms, rows = terms[keep], rows[keep]
+        result = pd.DataFrame({by: vocab, 'count': np.bincount(terms, minlength=len(vocab))})
+        if field:
+            if self._field(field) != 'number':
+                raise ValueError(f"{field!r} is not a numeric field")
+            values = self.arrays[field][rows]
+            valid = ~np.isnan(values)
+            terms, values = terms[valid], values[valid]
+            counts = np.bincount(terms, minlength=len(vocab))
+            if stat in ('min', 'max'):
+                aggregated = np.full(len(vocab), np.inf if stat == 'min' else -np.inf)
+                (np.minimum if stat == 'min' else np.maximum).at(aggregated, terms, values)
+            else:
+                aggregated = np.bincount(terms, weights=values, minlength=len(vocab)).astype(np.float64)
+                if stat == 'mean':
+                    aggregated /= np.maximum(counts, 1)
+                elif stat == 'count':
+                    aggregated = counts.astype(np.float64)
+            result[f'{field} {stat}'] = np.where(counts > 0, aggregated, np.nan)
+        return result[result['count'] > 0].sort_values(['count', by], ascending=[False, True]).reset_index(drop=True)
+
+    def rows(self, ids, columns=None):
+        """The CSV rows `ids` (indexed by id), read at their byte offsets."""
+        offsets = self.arrays['offsets']
+        with open(self.csv_filename, 'rb') as f:
+            chunks = [f.readline()]
+            for row in ids:
+                f.seek(int(offsets[row]))
+                chunks.append(f.read(int(offsets[row + 1] - offsets[row])))
+        df = pd.read_csv(io.BytesIO(b"".join(chunks)), dtype=str, keep_default_na=False, na_values=[""])
+        df.index = np.asarray(ids)
+        return df[[column for column in columns if column in df.columns]] if columns else df
+
+
+def parse_condition(spec, text):
+    """'price=10:50', 'price=:50', 'rating=4.5' or 'cuisine=italian|chinese' -> (field, value) for `select`."""
+    field, _, value = text.partition('=')
+    field = field.strip()
+    if field in spec['numbers']:
+        low, separator, high = value.partition(':')
+        low = float(low) if low.strip() else None
+        high = (float(high) if high.strip() else None) if separator else low
+        return field, (low, high)
+    return field, value.split('|')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Filter, rank and group a scraped CSV through its indexes")
+    arg_parser.add_argument('dataset', choices=list(DATASETS))
+    arg_parser.add_argument('csv_filename')
+    arg_parser.add_argument('--where', action='append', default=[], metavar='FIELD=VALUE',
+                            help="numeric fields take LOW:HIGH (either end optional) or a number, term fields "
+                                 "one or more terms separated by | (repeatable, all must match)")
+    arg_parser.add_argument('--top', metavar='FIELD', help="order the matching rows by this numeric field, highest first")
+    arg_parser.add_argument('--ascending', action='store_true', help="with --top, lowest first")
+    arg_parser.add_argument('--group', metavar='FIELD', help="count the matching rows per term of this field")
+    arg_parser.add_argument('--agg', metavar='FIELD:STAT',
+                            help=f"with --group, also aggregate a numeric field ({', '.join(STATS)})")
+    arg_parser.add_argument('--limit', type=int, default=20, help="rows or groups to print")
+    args = arg_parser.parse_args()
+
+    started = time.perf_counter()
+    index = QueryIndex(args.csv_filename, args.dataset)
+    print(f"Opened the index of {args.csv_filename} ({len(index)} rows) in "
+          f"{(time.perf_counter() - started) * 1000:.1f}ms")
+    conditions = dict(parse_condition(index.spec, text) for text in args.where)
+
+    started = time.perf_counter()
+    if args.group:
+        field, _, stat = (args.agg or "").partition(':')
+        result = index.group(args.group, conditions, field or None, stat or 'mean').head(args.limit)
+        elapsed = time.perf_counter() - started
+    else:
+        if args.top:
+            ids = index.top(args.top, args.limit, conditions, ascending=args.ascending)
+        else:
+            ids = index.select(conditions)
+            print(f"{len(ids)} matching rows")
+            ids = ids[:args.limit]
+        elapsed = time.perf_counter() - started
+        result = index.rows(ids, DATASETS[args.dataset]['show'])
+    print(f"Answered in {elapsed * 1000:.1f}ms")
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.max_colwidth', 60):
+        print(result.to_string())
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Politeness budget shared by every worker: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token and return 0, or return the seconds until one is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def set_rate(self, rate):
+        """Change the rate from now on; tokens earned until now are credited at the old rate."""
+        with self.lock:
+            now = time.monotonic()
+            # `updated` lies in the future while a paused bucket waits to refill
+            if now > self.updated:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+            self.rate = rate
+            return rate
+
+    def acquire(self):
+        while True:
+            wait_time = self.try_acquire()
+            if not wait_time:
+                return
+            time.sleep(wait_time)
+
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (delta seconds or an HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AdaptiveRateLimiter:
+    """Per-host request rate that follows how the server responds (AIMD).
+
+    Every host gets its own TokenBucket starting at `rate` requests per
+    second. Each successful response adds `increase` to the rate, up to
+    `max_rate` (four times the starting rate by default); a 429/503, a page
+    reported as blocked (captcha, bot wall) or a response slower than
+    `slow_latency` seconds multiplies it by `decrease`, down to `min_rate`.
+    Throttling responses also pause the host for their Retry-After, or one
+    request interval when there is none. `metrics()` reports the current
+    rates and backoff counts.
+    """
+
+    THROTTLE_STATUSES = (429, 503)
+
+    def __init__(self, rate=0.5, burst=2, min_rate=0.05, max_rate=None, increase=0.05, decrease=0.5,
+                 slow_latency=5.0):
+        self.initial_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 4
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_latency = slow_latency
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = {
+                    'bucket': TokenBucket(self.initial_rate, self.burst),
+                    'paused_until': 0.0,
+                    'requests': 0,
+                    'backoffs': 0,
+                    'throttled': 0,
+                    'blocked': 0,
+                    'slow': 0,
+                }
+            return self.hosts[host]
+
+    def try_acquire(self, url):
+        """Claim a request to `url`'s host and return 0, or return the seconds to wait before trying again."""
+        state = self._host(url)
+        with self.lock:
+            pause = state['paused_until'] - time.monotonic()
+        if pause > 0:
+            return pause
+        return state['bucket'].try_acquire()
+
+    def acquire(self, url):
+        """Wait until a request to `url`'s host is allowed."""
+        while True:
+            wait_time = self.try_acquire(url)
+            if not wait_time:
+                return
+            time.sleep(wait_time)
+
+    def record(self, url, status=None, latency=None, retry_after=None, blocked=False):
+        """Feed back the outcome of one request; return True if the host was backed off."""
+        state = self._host(url)
+        throttled = status in self.THROTTLE_STATUSES
+        slow = latency is not None and latency > self.slow_latency
+        with self.lock:
+            bucket = state['bucket']
+            state['requests'] += 1
+            if not (throttled or blocked or slow):
+                bucket.set_rate(min(self.max_rate, bucket.rate + self.increase))
+                return False
+
+            rate = bucket.set_rate(max(self.min_rate, bucket.rate * self.decrease))
+            state['backoffs'] += 1
+            state['throttled'] += throttled
+            state['blocked'] += blocked
+            state['slow'] += slow
+            if throttled or blocked:
+                pause = retry_after_seconds(retry_after)
+                if pause is None:
+                    pause = 1 / rate
+                state['paused_until'] = max(state['paused_until'], time.monotonic() + pause)
+                # Start again from an empty bucket after the pause
+                with bucket.lock:
+                    bucket.tokens = 0
+                    bucket.updated = state['paused_until']
+        reason = 'blocked page' if blocked else f'HTTP {status}' if throttled else f'{latency:.1f}s response'
+        logging.warning(f"Backing off {urlparse(url).netloc} after {reason}: now {rate:.2f} req/s")
+        return True
+
+    def metrics(self):
+        with self.lock:
+            return {
+                host: {
+                    'rate': round(state['bucket'].rate, 3),
+                    'requests': state['requests'],
+                    'backoffs': state['backoffs'],
+                    'throttled': state['throttled'],
+                    'blocked': state['blocked'],
+                    'slow': state['slow'],
+                    'paused_for': round(max(0.0, state['paused_until'] - time.monotonic()), 1),
+                }
+                for host, state in self.hosts.items()
+            }
@@ -0,0 +1,438 @@
+import glob
+import os
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet backend is optional
+    pa = None
+    pq = None
+
+from scraper_core.metrics import metrics
+
+
+def first_number(series):
+    """Vectorized: first number in each string ("₹2,200 for two" -> 2200.0), NaN if none."""
+    numbers = series.astype("string").str.replace(",", "", regex=False).str.extract(r"(\d+(?:\.\d+)?)")[0]
+    return pd.to_numeric(numbers, errors="coerce")
+
+
+class FileLock:
+    """Exclusive lock through a lock file, for threads and processes writing the same dataset.
+
+    A context manager; it is not reentrant.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.thread_lock = threading.Lock()
+        self.file = open(filename, 'a+b')
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # gave up after 10 seconds; keep waiting
+                        continue
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.thread_lock.release()
+
+    def close(self):
+        self.file.close()
+
+
+class Sink:
+    """Base class for dataset storage.
+
+    `types` maps column -> 'int' | 'float' | 'string' (undeclared columns are
+    strings) and `derived` maps a new column -> function(DataFrame) -> Series,
+    evaluated on every batch before it is stored. `normalize(DataFrame)`
+    returns the batch with typed columns added (see scraper_core.normalize);
+    unlike derived columns, they are kept by every backend and in CSV exports.
+    """
+
+    def __init__(self, path, types=None, derived=None, normalize=None):
+        self.path = path
+        self.types = types or {}
+        self.derived = derived or {}
+        self.normalize = normalize
+
+    def _prepare(self, records):
+        df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+        df = df.copy()
+        for column, derive in self.derived.items():
+            df[column] = derive(df)
+        if self.normalize and not df.empty:
+            with metrics.timer('normalize'):
+                df = self.normalize(df)
+        return df
+
+    def write(self, records):
+        raise NotImplementedError
+
+    def read_columns(self, columns=None):
+        raise NotImplementedError
+
+    def last_modified(self):
+        raise NotImplementedError
+
+    def refresh(self):
+        """Pick up changes another process made to the stored data; call holding its FileLock."""
+        pass
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def export_csv(self, csv_filename):
+        """Write the stored data (without derived columns) as a plain CSV."""
+        df = self.read_columns()
+        df = df.drop(columns=[column for column in self.derived if column in df.columns])
+        tmp_filename = csv_filename + ".tmp"
+        df.to_csv(tmp_filename, index=False)
+        os.replace(tmp_filename, csv_filename)
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink(Sink):
+    """Appends batches to a single CSV, keeping the header of the existing file.
+
+    Values are stored as text; `types` and `derived` only apply to typed backends,
+    while `normalize` runs on every batch (and on the existing rows when it adds
+    columns the file does not have yet).
+    A new file or a schema change is written to a temporary file and renamed
+    into place; each batch is appended with a single write, and a trailing
+    partial row left by a crash is truncated when the sink is opened.
+    """
+
+    def __init__(self, path, types=None, derived=None, normalize=None):
+        super().__init__(path, types, normalize=normalize)
+        self.refresh()
+
+    def refresh(self):
+        """Read the header again (and cut a partial row), e.g. after another process wrote the file."""
+        self.columns = None
+        # A file left empty (a crash before the header, or a truncated first row) is rewritten by the next batch
+        if self.exists() and self._truncate_partial_row():
+            self.columns = list(pd.read_csv(self.path, nrows=0).columns)
+
+    def _truncate_partial_row(self):
+        """Cut a trailing partial row; return the size left in the file."""
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return 0
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return size
+            # Walk back to the end of the last complete row
+            position = size
+            while position > 0:
+                step = min(65536, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    f.truncate(position + newline + 1)
+                    return position + newline + 1
+            f.truncate(0)
+            return 0
+
+    def write(self, records):
+        df = self._prepare(records)
+        if df.empty:
+            return
+        if self.columns is None:
+            self.columns = list(df.columns)
+            tmp_filename = self.path + ".tmp"
+            df.to_csv(tmp_filename, index=False)
+            os.replace(tmp_filename, self.path)
+            return
+        new_columns = [column for column in df.columns if column not in self.columns]
+        if new_columns:
+            # Schema changed: rewrite once with the union of columns
+            self.columns += new_columns
+            existing = pd.read_csv(self.path, dtype=str)
+            if self.normalize:
+                # Rows written before the typed columns existed get them too
+                existing = self.normalize(existing)
+            tmp_filename = self.path + ".tmp"
+            existing.reindex(columns=self.columns).to_csv(tmp_filename, index=False)
+            os.replace(tmp_filename, self.path)
+        rows = df.reindex(columns=self.columns).to_csv(index=False, header=False)
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            f.write(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read_columns(self, columns=None):
+        if self.columns is None:
+            return pd.DataFrame(columns=columns)
+        usecols = [column for column in columns if column in self.columns] if columns else None
+        df = pd.read_csv(self.path, usecols=usecols, dtype=str)
+        return df.reindex(columns=columns) if columns else df
+
+    def last_modified(self):
+        return os.path.getmtime(self.path) if self.exists() else 0
+
+    def export_csv(self, csv_filename):
+        if os.path.abspath(csv_filename) != os.path.abspath(self.path):
+            super().export_csv(csv_filename)
+
+
+class ParquetSink(Sink):
+    """Date-partitioned Parquet dataset (`<path>/date=YYYY-MM-DD/part-*.parquet`).
+
+    Every write lands as a new part file written under a temporary name and
+    renamed into place; once a partition holds `compact_after` parts they are
+    merged into one file. Columns are stored with their declared types.
+    """
+
+    def __init__(self, path, types=None, derived=None, normalize=None, compact_after=32):
+        if pq is None:
+            raise ImportError("The Parquet backend requires pyarrow (pip install pyarrow)")
+        super().__init__(path, types, derived, normalize)
+        self.compact_after = compact_after
+        self.sequence = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def _arrow_type(self, column):
+        kind = self.types.get(column, "string")
+        return {"int": pa.int64(), "float": pa.float64()}.get(kind, pa.string())
+
+    def _typed(self, df):
+        for column in df.columns:
+            kind = self.types.get(column, "string")
+            if kind == "int":
+                df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+            elif kind == "float":
+                df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+            else:
+                df[column] = df[column].astype("string")
+        schema = pa.schema([(column, self._arrow_type(column)) for column in df.columns])
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+    def _partition_dir(self):
+        directory = os.path.join(self.path, f"date={date.today().isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _parts(self, directory):
+        return sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+
+    def _write_table(self, table, filename):
+        tmp_filename = filename + ".tmp"
+        pq.write_table(table, tmp_filename)
+        os.replace(tmp_filename, filename)
+
+    def write(self, records):
+        df = self._prepare(records)
+        if df.empty:
+            return
+        directory = self._partition_dir()
+        self.sequence += 1
+        filename = os.path.join(directory, f"part-{time.time_ns()}-{os.getpid()}-{self.sequence}.parquet")
+        self._write_table(self._typed(df), filename)
+        if len(self._parts(directory)) >= self.compact_after:
+            self._compact_partition(directory)
+
+    def _compact_partition(self, directory):
+        parts = self._parts(directory)
+        if len(parts) < 2:
+            return
+        table = pa.concat_tables([pq.read_table(part, partitioning=None) for part in parts], promote_options="default")
+        # Sorts before every timestamped part still to come
+        self._write_table(table, os.path.join(directory, f"part-0-compacted-{time.time_ns()}.parquet"))
+        for part in parts:
+            os.remove(part)
+
+    def compact(self):
+        for directory in sorted(glob.glob(os.path.join(self.path, "date=*"))):
+            self._compact_partition(directory)
+
+    def read_columns(self, columns=None):
+        parts = sorted(glob.glob(os.path.join(self.path, "date=*", "part-*.parquet")))
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        tables = []
+        for part in parts:
+            available = pq.read_schema(part).names
+            wanted = [column for column in columns if column in available] if columns else None
+            tables.append(pq.read_table(part, columns=wanted, partitioning=None))
+        df = pa.concat_tables(tables, promote_options="default").to_pandas()
+        return df.reindex(columns=columns) if columns else df
+
+    def last_modified(self):
+        parts = glob.glob(os.path.join(self.path, "date=*", "part-*.parquet"))
+        return max((os.path.getmtime(part) for part in parts), default=0)
+
+
+class StreamingSink:
+    """Write-behind wrapper that batches records and flushes them to `sink` on a background thread.
+
+    Records collect in a bounded buffer and are written once `batch_size` are
+    waiting or `flush_interval` seconds have passed; `write` blocks while the
+    buffer is full. `on_flush(records)` is called after every batch has been
+    stored, from the flushing thread.
+    """
+
+    def __init__(self, sink, batch_size=100, flush_interval=5.0, max_buffer=1000, on_flush=None):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max(max_buffer, batch_size)
+        self.on_flush = on_flush
+        self.buffer = []
+        self.written = 0
+        self.error = None
+        self.closed = False
+        self.flush_requested = False
+        self.in_flight = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="sink-writer", daemon=True)
+        self.thread.start()
+
+    @property
+    def path(self):
+        return self.sink.path
+
+    def write(self, records):
+        if isinstance(records, pd.DataFrame):
+            records = records.to_dict("records")
+        with self.condition:
+            for record in records:
+                while len(self.buffer) >= self.max_buffer and not self.error:
+                    self.condition.wait()
+                self._raise_error()
+                self.buffer.append(record)
+                if len(self.buffer) >= self.batch_size:
+                    self.condition.notify_all()
+
+    def _raise_error(self):
+        if self.error:
+            raise RuntimeError(f"Background write to {self.sink.path} failed") from self.error
+
+    def _run(self):
+        while True:
+            with self.condition:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self.buffer) < self.batch_size and not (self.closed or self.flush_requested):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch, self.buffer = self.buffer, []
+                self.flush_requested = False
+                self.in_flight = bool(batch)
+                closed = self.closed
+                self.condition.notify_all()
+            if batch:
+                try:
+                    with metrics.timer('write'):
+                        self.sink.write(batch)
+                    metrics.inc('records_written', len(batch))
+                    if self.on_flush:
+                        self.on_flush(batch)
+                except Exception as e:
+                    with self.condition:
+                        self.error = e
+                with self.condition:
+                    self.written += len(batch)
+                    self.in_flight = False
+                    self.condition.notify_all()
+            if (closed and not self.buffer) or self.error:
+                return
+
+    def flush(self):
+        """Block until every buffered record has been stored."""
+        with self.condition:
+            while (self.buffer or self.in_flight) and self.thread.is_alive() and not self.error:
+                self.flush_requested = True
+                self.condition.notify_all()
+                self.condition.wait()
+            self._raise_error()
+
+    def read_columns(self, columns=None):
+        self.flush()
+        return self.sink.read_columns(columns)
+
+    def last_modified(self):
+        return self.sink.last_modified()
+
+    def compact(self):
+        self.flush()
+        self.sink.compact()
+
+    def export_csv(self, csv_filename):
+        self.flush()
+        self.sink.export_csv(csv_filename)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.sink.close()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+SINKS = {
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+}
+
+
+def make_sink(backend, path, **kwargs):
+    """Build a sink by backend name; `path` is a file for CSV and a directory for Parquet."""
+    try:
+        sink_class = SINKS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend!r} (expected one of {sorted(SINKS)})")
+    return sink_class(path, **kwargs)
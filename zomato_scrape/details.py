@@ -0,0 +1,92 @@
+import json
+
+from lxml import html
+
+DETAIL_FIELDS = ['name', 'location', 'dining rating', 'dining reviews', 'cuisine', 'price', 'address', 'phone']
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US, en;q=0.9",
+}
+
+# Same elements the Selenium extractor reads, for pages where they are server rendered
+HTML_FIELDS = {
+    'name': ('h1', 'sc-7kepeu-0 sc-iSDuPN fwzNdh'),
+    'location': ('a', 'sc-clNaTc vNCcy'),
+    'dining rating': ('div', 'sc-1q7bklc-1 cILgox'),
+    'dining reviews': ('div', 'sc-1q7bklc-8 kEgyiI'),
+    'cuisine': ('div', 'sc-gVyKpa fXdtVd'),
+    'price': ('div', 'sc-bEjcJn ePRRqr'),
+    'address': ('p', 'sc-bFADNz gNdKCg'),
+    'phone': ('a', 'sc-bFADNz leEVAg'),
+}
+
+
+def _class_xpath(tag, classes):
+    tests = " and ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in classes.split()
+    )
+    return f"//{tag}[{tests}]"
+
+
+HTML_XPATHS = {field: _class_xpath(tag, classes) for field, (tag, classes) in HTML_FIELDS.items()}
+UTF8_PARSER = html.HTMLParser(encoding='utf-8')
+
+
+def _restaurant_json_ld(tree):
+    for script in tree.xpath("//script[@type='application/ld+json']/text()"):
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and item.get('@type') in ('Restaurant', 'FoodEstablishment'):
+                return item
+    return None
+
+
+def _from_json_ld(item):
+    address = item.get('address') or {}
+    rating = item.get('aggregateRating') or {}
+    cuisine = item.get('servesCuisine')
+    if isinstance(cuisine, list):
+        cuisine = ", ".join(cuisine)
+    if isinstance(address, str):
+        address = {'streetAddress': address}
+    return {
+        'name': item.get('name'),
+        'location': address.get('addressLocality'),
+        'dining rating': rating.get('ratingValue'),
+        'dining reviews': rating.get('ratingCount') or rating.get('reviewCount'),
+        'cuisine': cuisine,
+        'price': item.get('priceRange'),
+        'address': address.get('streetAddress'),
+        'phone': item.get('telephone'),
+    }
+
+
+def parse_detail_html(content, url):
+    """Pull detail fields from server-rendered HTML: embedded JSON-LD first, then the known elements.
+
+    Returns (record, missing) where `missing` lists the fields not found.
+    """
+    tree = html.fromstring(content, parser=UTF8_PARSER)
+    record = dict.fromkeys(DETAIL_FIELDS)
+
+    item = _restaurant_json_ld(tree)
+    if item:
+        record.update({field: value for field, value in _from_json_ld(item).items() if value not in (None, "")})
+
+    for field, xpath in HTML_XPATHS.items():
+        if record[field] in (None, ""):
+            elements = tree.xpath(xpath)
+            if elements:
+                record[field] = elements[0].text_content().strip()
+
+    record = {field: str(value).strip() if value is not None else None for field, value in record.items()}
+    record['url'] = url
+    missing = [field for field in DETAIL_FIELDS if not record[field]]
+    return record, missing
+
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+INSERT = 'insert'
+UPDATE = 'update'
+UNCHANGED = 'unchanged'
+DUPLICATE = 'duplicate'
+
+
+def content_hash(record):
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ChangeTracker:
+    """Remembers a content hash and last-seen time per restaurant across cycles.
+
+    `observe` classifies each scraped card as an insert, an update or
+    unchanged; inserts and updates are appended to a JSON-lines delta log so
+    a cycle only writes what changed. State lives in SQLite, so each cycle
+    touches only the rows it actually sees.
+
+    Changes are staged and committed (state and delta log together) by
+    `stored(records)`, the dataset's StreamingSink on_flush hook: an insert
+    once its record has been written, every other change with the next
+    batch or on `close()`. The state never runs ahead of the stored data, so
+    after a crash or a failed write the unstored inserts are inserts again
+    next cycle. An insert that is deliberately not stored is recorded as
+    seen with `skip`, so the next cycle finds it unchanged.
+    """
+
+    def __init__(self, state_filename='zomato_state.sqlite', delta_filename='zomato_delta.jsonl'):
+        self.lock = threading.Lock()
+        # Committed from the sink's writer thread
+        self.db = sqlite3.connect(state_filename, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS restaurants (key TEXT PRIMARY KEY, hash TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self.delta = open(delta_filename, 'a', encoding='utf-8')
+        self.counts = {INSERT: 0, UPDATE: 0, UNCHANGED: 0, DUPLICATE: 0}
+        self.staged = []  # (change, key, hash, seen at, record), committed with the next batch
+        self.inserts = {}  # hash -> (key, hash, seen at, record), committed once the record is stored
+
+    def observe(self, key, record, baseline=False):
+        """Classify `record` and stage its hash.
+
+        `baseline` marks records already present in the dataset before
+        tracking started: the first sighting is stored as unchanged.
+        """
+        digest = content_hash(record)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT hash FROM restaurants WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                change = UNCHANGED if baseline else INSERT
+            elif row[0] != digest:
+                change = UPDATE
+            else:
+                change = UNCHANGED
+            if change == INSERT:
+                self.inserts[digest] = (key, digest, now, record)
+            else:
+                self.staged.append((change, key, digest, now, record))
+        self.counts[change] += 1
+        return change
+
+    def skip(self, record):
+        """Turn an observed insert that will not be stored into a duplicate, committed with the next batch."""
+        with self.lock:
+            insert = self.inserts.pop(content_hash(record), None)
+            if insert is None:
+                return
+            self.staged.append((DUPLICATE,) + insert)
+        self.counts[INSERT] -= 1
+        self.counts[DUPLICATE] += 1
+
+    def stored(self, records):
+        """Commit the inserts of the `records` just written to the dataset, and every other staged change."""
+        with self.lock:
+            changes, self.staged = self.staged, []
+            for record in records:
+                insert = self.inserts.pop(content_hash(record), None)
+                if insert is not None:
+                    changes.append((INSERT,) + insert)
+            self._commit(changes)
+
+    def _commit(self, changes):
+        if not changes:
+            return
+        for change, key, digest, now, record in changes:
+            if change in (INSERT, UPDATE):
+                entry = {'op': change, 'seen_at': datetime.fromtimestamp(now).isoformat(timespec='seconds')}
+                entry.update(record)
+                self.delta.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        # The delta log is synced first: a crash in between repeats a change next cycle instead of losing it
+        self.delta.flush()
+        os.fsync(self.delta.fileno())
+        self.db.executemany("INSERT OR REPLACE INTO restaurants (key, hash, last_seen) VALUES (?, ?, ?)",
+                            [(key, digest, now) for _, key, digest, now, _ in changes])
+        self.db.commit()
+
+    def close(self):
+        """Commit the staged updates and sightings; inserts whose records were never stored are dropped."""
+        with self.lock:
+            self._commit(self.staged)
+            self.staged = []
+            self.inserts.clear()
+            self.db.close()
+            self.delta.close()
+
+
+class ChangeFilter:
+    """Pipeline duplicate filter (see scraper_core.pipeline.KeySet) for incremental runs.
+
+    Every card not seen earlier in the run is classified by `tracker`, so
+    updates reach its delta log, but only inserts are passed on to be stored.
+    `exhausted` turns true after `stop_after` unchanged cards in a row, when
+    the rest of the listing is most likely unchanged as well. `known` holds
+    the keys already in the dataset (see ChangeTracker.observe's `baseline`).
+    Inserts are also offered to `duplicates` (another filter, such as a
+    near-duplicate index); one it rejects is recorded as seen but not stored,
+    and counts as unchanged.
+    """
+
+    def __init__(self, tracker, key, known=(), stop_after=50, duplicates=None):
+        self.tracker = tracker
+        self.duplicates = duplicates
+        self.key = key
+        self.known = set(known)
+        self.seen = set()
+        self.stop_after = stop_after
+        self.unchanged_run = 0
+
+    def add(self, record):
+        key = self.key(record)
+        if self.exhausted or key in self.seen:
+            return False
+        self.seen.add(key)
+        change = self.tracker.observe("-".join(key), record, baseline=key in self.known)
+        if change == INSERT and self.duplicates is not None and not self.duplicates.add(record):
+            self.tracker.skip(record)
+            change = DUPLICATE
+        self.unchanged_run = self.unchanged_run + 1 if change in (UNCHANGED, DUPLICATE) else 0
+        # Updates only go to the delta log; new restaurants are also stored
+        return change == INSERT
+
+    @property
+    def exhausted(self):
+        return self.unchanged_run >= self.stop_after
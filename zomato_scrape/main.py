@@ -1,172 +1,118 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
-import time
 import logging
 from datetime import datetime
-from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, NoSuchElementException
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_core.browser import BrowserFetcher  # noqa: E402
+from scraper_core.fetcher import PageFetcher  # noqa: E402
+from scraper_core.metrics import metrics, profiled  # noqa: E402
+from scraper_core.normalize import DATASETS, column_types  # noqa: E402
+from scraper_core.pipeline import Pipeline  # noqa: E402
+from scraper_core.sinks import first_number, StreamingSink  # noqa: E402
+from details import HEADERS  # noqa: E402
+from zomato_site import (ListingFetcher, ListingSite, DetailSite, chrome_driver, zomato_sink,  # noqa: E402
+                         CARD_LINK, DETAIL_READY, LISTING_URL)
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Typed columns for storage backends that support them
+COLUMN_TYPES = {'dining rating': 'float', 'dining reviews': 'int', 'price value': 'float',
+                **column_types(DATASETS['zomato_details'])}
+DERIVED_COLUMNS = {'price value': lambda df: first_number(df['price'])}
+
 class ZomatoScraper:
     def __init__(self):
-        self.service = Service(ChromeDriverManager().install())
-        self.options = webdriver.ChromeOptions()
-        self._configure_options()
-        self.driver = webdriver.Chrome(service=self.service, options=self.options)
-        self.restaurant_urls = []
-        self.detailed_data = []
+        self.driver = chrome_driver()
+        self.sink = None
+        self.collected_count = 0
         self.target_records = 1000
+        self.listing_url = LISTING_URL
+        self.detail_workers = 4  # headless browsers visiting detail pages in parallel
+        self.detail_rate = 1.0  # detail page loads per second across all workers
+        self.http_first = True  # try a plain HTTP fetch before loading a detail page in a browser
+        self.http_rate = 5.0  # plain HTTP detail fetches per second
         self.start_time = datetime.now()
-        self.unique_identifiers = set()  # Track URLs to avoid duplicates
-
-    def _configure_options(self):
-        self.options.add_argument('--start-maximized')
-        self.options.add_argument('--disable-blink-features=AutomationControlled')
-        self.options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' +
-                                  'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-        self.options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        # Uncomment to run headless
-        # self.options.add_argument('--headless')
+        self.storage_backend = 'csv'  # or 'parquet'
+        self.bulk_extraction = True  # read all new card links with one execute_script call per round
+        self.metrics_file = None  # e.g. 'zomato_metrics.prom' (Prometheus text) or 'zomato_metrics.jsonl'
+        self.profile_file = None  # e.g. 'zomato.prof' to run under cProfile
 
-    def _scroll_to_bottom(self):
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-        while True:
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-
-    def _extract_restaurant_urls(self):
-        try:
-            cards = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_all_elements_located(
-                    (By.CSS_SELECTOR, "div.sc-1mo3ldo-0.sc-jGkVzM.BXbKf")
-                )
-            )
-            logging.info(f"Found {len(cards)} restaurant cards on the page.")
-            
-            for card in cards:
-                try:
-                    # Extract restaurant URL
-                    link_element = card.find_element(By.CSS_SELECTOR, "a.sc-hPeUyl.cKQNlu")
-                    url = link_element.get_attribute('href')
-                    if url in self.unique_identifiers:
-                        continue
-                    self.unique_identifiers.add(url)
-                    self.restaurant_urls.append(url)
-                    if len(self.restaurant_urls) >= self.target_records:
-                        logging.info("Reached target number of URLs.")
-                        return
-                except (StaleElementReferenceException, NoSuchElementException) as e:
-                    logging.debug(f"Skipping card: {str(e)}")
-                    continue
-        except Exception as e:
-            logging.error(f"Extraction error: {str(e)}")
+    def _make_sink(self):
+        sink = zomato_sink('zomato_details', self.storage_backend, types=COLUMN_TYPES, derived=DERIVED_COLUMNS)
+        # Records are flushed while scraping so a crash only loses the current batch
+        return StreamingSink(sink, batch_size=50)
 
-    def _load_full_page(self):
-        scroll_attempts = 0
-        max_scroll_attempts = 2
-        
-        while scroll_attempts < max_scroll_attempts:
-            initial_count = len(self.restaurant_urls)
-            self._scroll_to_bottom()
-            self._extract_restaurant_urls()
-                
-            if len(self.restaurant_urls) >= self.target_records:
-                logging.info("Collected desired amount of URLs.")
-                break
-                
-            if len(self.restaurant_urls) == initial_count:
-                scroll_attempts += 1
-                logging.info(f"No new URLs found. Scroll attempt {scroll_attempts}/{max_scroll_attempts}")
-                time.sleep(1)
-            else:
-                scroll_attempts = 0
+    def _collect_restaurant_urls(self):
+        site = ListingSite(self.listing_url, {'url': (CARD_LINK, 'href')}, key_fields=('url',))
+        fetcher = ListingFetcher(self.driver, site.fields, bulk_extraction=self.bulk_extraction)
+        pipeline = Pipeline(site, fetcher, limit=self.target_records)
+        urls = [record['url'] for _, new in pipeline.run() for record in new]
+        if len(urls) >= self.target_records:
+            logging.info("Collected desired amount of URLs.")
+        return urls
 
-    def _extract_restaurant_details(self, url):
-        try:
-            self.driver.get(url)
-            # Wait for critical elements to load
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "h1.sc-7kepeu-0"))
-            )
-            # Extract details
-            name = self.driver.find_element(By.CSS_SELECTOR, "h1.sc-7kepeu-0.sc-iSDuPN.fwzNdh").text.strip()
-            location = self.driver.find_element(By.CSS_SELECTOR, "a.sc-clNaTc.vNCcy").text.strip()
-            dining_rating = self.driver.find_element(By.CSS_SELECTOR, "div.sc-1q7bklc-1.cILgox").text.strip()
-            dining_reviews = self.driver.find_element(By.CSS_SELECTOR, "div.sc-1q7bklc-8.kEgyiI").text.strip()
-            cuisine = self.driver.find_element(By.CSS_SELECTOR, "div.sc-gVyKpa.fXdtVd").text.strip()
-            price = self.driver.find_element(By.CSS_SELECTOR, "div.sc-bEjcJn.ePRRqr").text.strip()
-            
-            # Additional details (customize selectors as needed)
-            address = self.driver.find_element(By.CSS_SELECTOR, "p.sc-bFADNz.gNdKCg").text.strip()
-            phone = self.driver.find_element(By.CSS_SELECTOR, "a.sc-bFADNz.leEVAg").text.strip()
+    def _save_details(self, pipeline):
+        for _, new in pipeline.run():
+            for data in new:
+                self.collected_count += 1
+                metrics.inc('records_saved')
+                logging.info(f"Collected data for {data['name']}")
 
-            return {
-                'name': name,
-                'location': location,
-                'dining rating': dining_rating,
-                'dining reviews': dining_reviews,
-                'cuisine': cuisine,
-                'price': price,
-                'address': address,
-                'phone': phone,
-                'url': url
-            }
-        except Exception as e:
-            logging.error(f"Error scraping {url}: {str(e)}")
-            return None
+    def _scrape_restaurant_details(self, urls):
+        if self.http_first:
+            # Most detail pages carry every field in their server-rendered HTML;
+            # only the rest need a browser. A 403 is a bot wall and backs the host off
+            site = DetailSite(urls)
+            fetcher = PageFetcher(lambda: HEADERS, max_workers=8, rate=self.http_rate, burst=5, timeout=10,
+                                  block_statuses=(403,), max_attempts=1)
+            with fetcher:
+                self._save_details(Pipeline(site, fetcher, self.sink))
+            logging.info(f"HTTP rate control: {fetcher.limiter.metrics()}")
+            logging.info(f"{len(urls) - len(site.incomplete)} pages parsed over HTTP, "
+                         f"{len(site.incomplete)} need a browser.")
+            urls = site.incomplete
+        if not urls:
+            return
 
-    def _scrape_restaurant_details(self):
-        for url in self.restaurant_urls[:self.target_records]:  # Limit to target
-            data = self._extract_restaurant_details(url)
-            if data:
-                self.detailed_data.append(data)
-                logging.info(f"Collected data for {data['name']}")
-            # Throttle requests to avoid being blocked
-            time.sleep(2)
+        # Rendered pages go through the same HTML parser as the HTTP ones
+        site = DetailSite(urls)
+        fetcher = BrowserFetcher(
+            lambda: chrome_driver(headless=True),
+            wait_for=DETAIL_READY,
+            workers=min(self.detail_workers, len(urls)),
+            rate=self.detail_rate,  # Throttle requests to avoid being blocked
+        )
+        self._save_details(Pipeline(site, fetcher, self.sink))
+        if site.incomplete:
+            logging.warning(f"{len(site.incomplete)} detail pages could not be scraped.")
 
     def run(self):
+        if self.metrics_file:
+            metrics.enable()
+        self.sink = self._make_sink()
         try:
             logging.info("Collecting restaurant URLs...")
-            self.driver.get("https://www.zomato.com/ncr/restaurants")
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.sc-1mo3ldo-0.sc-jGkVzM.BXbKf"))
-            )
-            self._load_full_page()
-            
-            logging.info(f"Collected {len(self.restaurant_urls)} URLs. Now scraping details...")
-            self._scrape_restaurant_details()
+            with profiled(self.profile_file):
+                restaurant_urls = self._collect_restaurant_urls()
+
+                logging.info(f"Collected {len(restaurant_urls)} URLs. Now scraping details...")
+                self._scrape_restaurant_details(restaurant_urls)
 
-            # Save data
-            df = pd.DataFrame(self.detailed_data)
-            if not df.empty:
-                df.drop_duplicates(subset=['url'], inplace=True)
-                # Merge with existing data
-                try:
-                    existing_df = pd.read_csv('zomato_data.csv')
-                except FileNotFoundError:
-                    existing_df = pd.DataFrame()
-                combined_df = pd.concat([existing_df, df], ignore_index=True)
-                combined_df.to_csv('zomato_data.csv', index=False)
-                logging.info(f"Saved {len(combined_df)} records.")
+            if self.collected_count:
+                logging.info(f"Saved {self.collected_count} new records.")
             else:
                 logging.info("No data collected.")
         except Exception as e:
             logging.error(f"Main error: {str(e)}")
         finally:
+            self.sink.close()
             self.driver.quit()
+            if self.metrics_file:
+                metrics.export(self.metrics_file)
 
 if __name__ == '__main__':
     scraper = ZomatoScraper()
@@ -1,179 +1,170 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
 import time
 import logging
 from datetime import datetime
-from selenium.common.exceptions import StaleElementReferenceException
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_core.browser import DriverPool, is_driver_crash  # noqa: E402
+from scraper_core.metrics import metrics, profiled  # noqa: E402
+from scraper_core.normalize import DATASETS, column_types  # noqa: E402
+from scraper_core.neardup import SinkNearDuplicates  # noqa: E402
+from scraper_core.pipeline import AllNew, KeySet, Pipeline  # noqa: E402
+from scraper_core.sinks import first_number, StreamingSink  # noqa: E402
+from zomato_site import (ListingFetcher, ListingSite, chrome_options, zomato_sink,  # noqa: E402
+                         CARD_FIELDS, LISTING_URL)
+from incremental import ChangeFilter, ChangeTracker  # noqa: E402
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Typed columns for storage backends that support them
+COLUMN_TYPES = {'rating': 'float', 'price value': 'float', **column_types(DATASETS['zomato_cards'])}
+DERIVED_COLUMNS = {'price value': lambda df: first_number(df['price'])}
+
 class ZomatoScraper:
-    def __init__(self):
-        self.service = Service(ChromeDriverManager().install())
-        self.options = webdriver.ChromeOptions()
-        self._configure_options()
-        self.driver = webdriver.Chrome(service=self.service, options=self.options)
-        self.collected_data = set()
+    def __init__(self, driver_pool=None, incremental=False):
+        self.options = chrome_options()
+        # Without a shared pool the browser lives for this run only
+        self.owns_pool = driver_pool is None
+        self.driver_pool = driver_pool or DriverPool()
+        self.driver = None  # acquired from the pool for the length of run()
+        self.driver_healthy = True
+        self.fetcher = None
+        self.sink = None
+        self.known_records = set()  # (name, location) pairs already stored
+        self.collected_count = 0
         self.target_records = 2000
         self.start_time = datetime.now()
-        self.unique_identifiers = set()
-
-    def _configure_options(self):
-        self.options.add_argument('--start-maximized')
-        self.options.add_argument('--disable-blink-features=AutomationControlled')
-        self.options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' +
-                                  'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-        self.options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        # Uncomment the following line to run Chrome in headless mode
-        # self.options.add_argument('--headless')
-
-    def _scroll_to_bottom(self):
-        """Smooth scroll to trigger lazy loading"""
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-        while True:
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-
-    def _extract_restaurant_data(self):
-        try:
-            cards = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_all_elements_located(
-                    (By.CSS_SELECTOR, "div.sc-1mo3ldo-0.sc-jGkVzM.BXbKf")
-                )
-            )
-            logging.info(f"Found {len(cards)} restaurant cards on the page.")
-            
-            for card in cards:
-                try:
-                    # Get unique identifier using name and location
-                    name = card.find_element(By.CSS_SELECTOR, "h4.sc-1hp8d8a-0.sc-Ehqfj.bxOQva").text.strip()
-                    location = card.find_element(By.CSS_SELECTOR, "p.sc-1hez2tp-0.sc-cyQzhP.uIMEk").text.strip()
-                    uid = f"{name}-{location}"
-                    
-                    if uid in self.unique_identifiers:
-                        continue
-
-                    rating = card.find_element(By.CSS_SELECTOR, "div.sc-1q7bklc-1.cILgox").text.strip()
-                    cuisine = card.find_element(By.CSS_SELECTOR, "p.sc-1hez2tp-0.sc-gggouf.fSxdnq").text.strip()
-                    price = card.find_element(By.CSS_SELECTOR, "p.sc-1hez2tp-0.sc-gggouf.KXcjT").text.strip()
-
-                    # Validate all fields
-                    if not all([name, location, rating, cuisine, price]):
-                        continue
-
-                    self.unique_identifiers.add(uid)
-                    data = {
-                        'name': name,
-                        'location': location,
-                        'rating': rating,
-                        'cuisine': cuisine,
-                        'price': price,
-                    }
-                    logging.debug(f"Extracted data: {data}")
-                    yield data
-
-                    if len(self.unique_identifiers) >= self.target_records:
-                        logging.info("Reached target number of records.")
-                        return
-
-                except (StaleElementReferenceException, Exception) as e:
-                    logging.debug(f"Skipping a card due to error: {str(e)}")
-                    continue
-
-        except Exception as e:
-            logging.error(f"Extraction error: {str(e)}")
+        self.storage_backend = 'csv'  # or 'parquet'
+        self.bulk_extraction = True  # read all new cards with one execute_script call per round
+        self.metrics_file = None  # e.g. 'zomato_metrics.prom' (Prometheus text) or 'zomato_metrics.jsonl'
+        self.profile_file = None  # e.g. 'zomato.prof' to run under cProfile
+        # Incremental mode: only inserts/updates are emitted (to zomato_delta.jsonl),
+        # and scrolling stops after this many consecutive unchanged cards
+        self.incremental = incremental
+        self.stop_after_unchanged = 50
+        self.tracker = None
+        # Also skip new cards whose name and location nearly match a stored one
+        self.near_duplicates = True
+        self.near_index = None
+
+    def _make_sink(self):
+        sink = zomato_sink('zomato_cards', self.storage_backend, types=COLUMN_TYPES, derived=DERIVED_COLUMNS)
+        # Only the key columns of existing data are needed to skip repeats
+        existing_keys = sink.read_columns(['name', 'location'])
+        self.known_records = set(zip(existing_keys['name'], existing_keys['location']))
+        if self.near_duplicates:
+            self.near_index = SinkNearDuplicates(sink, 'zomato_cards')
+        # Records are flushed while scraping so a crash only loses the current batch;
+        # the change tracker commits with every stored batch, never ahead of it
+        return StreamingSink(sink, batch_size=50, on_flush=self.tracker.stored if self.tracker else None)
 
     def _load_full_page(self):
-        """Handle infinite scroll with timeout"""
-        scroll_attempts = 0
-        max_scroll_attempts = 2
-        
-        while scroll_attempts < max_scroll_attempts:
-            initial_count = len(self.unique_identifiers)
-            self._scroll_to_bottom()
-            
-            # Process newly loaded cards
-            for data in self._extract_restaurant_data():
-                self.collected_data.add(frozenset(data.items()))  # Prevent duplicates
-                
-            if len(self.collected_data) >= self.target_records:
-                logging.info("Collected desired amount of data.")
+        """Scroll the listing, storing new cards as they load"""
+        site = ListingSite(LISTING_URL, CARD_FIELDS, key_fields=('name', 'location'))
+        self.fetcher = fetcher = ListingFetcher(self.driver, CARD_FIELDS, bulk_extraction=self.bulk_extraction)
+        changes = None
+        if self.tracker:
+            # Near-duplicate inserts are recorded as seen without being stored
+            changes = seen = ChangeFilter(self.tracker, site.key, self.known_records,
+                                          stop_after=self.stop_after_unchanged, duplicates=self.near_index)
+        else:
+            seen = KeySet(site.key, self.known_records)
+            if self.near_index is not None:
+                seen = AllNew(seen, self.near_index)
+        pipeline = Pipeline(site, fetcher, self.sink, seen=seen, limit=self.target_records)
+
+        for _ in pipeline.run():
+            self.collected_count = pipeline.collected
+            progress = self._calculate_progress()
+            logging.info(f"Progress: {self.collected_count}/{self.target_records} ({progress['progress']:.1%}), "
+                         f"{progress['rate']:.1f} records/s, about {progress['remaining']} left")
+            if changes and changes.exhausted:
+                logging.info(f"Reached {changes.unchanged_run} unchanged restaurants in a row. Stopping scroll.")
                 break
-                
-            if len(self.unique_identifiers) == initial_count:
-                scroll_attempts += 1
-                logging.info(f"No new records found. Scroll attempt {scroll_attempts}/{max_scroll_attempts}")
-                time.sleep(1)
-            else:
-                scroll_attempts = 0
+        if self.collected_count >= self.target_records:
+            logging.info("Collected desired amount of data.")
 
     def _calculate_progress(self):
         elapsed = datetime.now() - self.start_time
-        progress = len(self.collected_data) / self.target_records
+        progress = self.collected_count / self.target_records
         remaining = (elapsed / progress) - elapsed if progress > 0 else 0
+        seconds = elapsed.total_seconds()
         return {
             'elapsed': elapsed,
             'progress': progress,
-            'remaining': remaining
+            'remaining': remaining,
+            'rate': self.collected_count / seconds if seconds > 0 else 0.0,
         }
 
-    def run(self):
+    def _close_storage(self):
+        """Close the sink, then what must not run ahead of it; a failed final write is logged."""
+        stored = False
+        try:
+            if self.sink:
+                self.sink.close()
+            stored = True
+        except Exception as e:
+            logging.error(f"Storing the last records failed: {str(e)}")
+        finally:
+            # Left stale after a failed write, so the next run rebuilds it from what was stored
+            if self.near_index is not None and stored:
+                self.near_index.close()
+            if self.tracker:
+                self.tracker.close()
+
+    def _scrape(self):
         try:
+            if self.incremental:
+                self.tracker = ChangeTracker()
+            self.sink = self._make_sink()
             logging.info("Navigating to the Zomato restaurants page...")
-            self.driver.get("https://www.zomato.com/ncr/restaurants")
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.sc-1mo3ldo-0.sc-jGkVzM.BXbKf"))
-            )
-            
-            logging.info("Page loaded. Beginning to scroll and extract data...")
-            self._load_full_page()
+            with profiled(self.profile_file):
+                self._load_full_page()
             
-            # Convert set of frozensets back to list of dictionaries
-            final_data = [dict(item) for item in self.collected_data]
-            
-            # Save data to CSV
-            df = pd.DataFrame(final_data)
-            if not df.empty:
-                df.drop_duplicates(subset=['name', 'location'], inplace=True)
-                # Handle existing data
-                try:
-                    existing_df = pd.read_csv('zomato_data.csv')
-                except FileNotFoundError:
-                    existing_df = pd.DataFrame()
-
-                # Combine and clean data
-                combined_df = pd.concat([existing_df, df], ignore_index=True)
-                # Replace empty strings and whitespace with NaN
-                combined_df = combined_df.replace(r'^\s*$', pd.NA, regex=True)
-                combined_df.dropna(inplace=True)
-                combined_df.drop_duplicates(subset=['name', 'location'], inplace=True)
-                combined_df.to_csv('zomato_data.csv', index=False)
-                logging.info(f"CSV updated. Total unique records: {len(combined_df)}")
+            if self.collected_count:
+                logging.info(f"Data updated. New unique records: {self.collected_count}")
             else:
                 logging.info("No new data collected in this cycle.")
+            if self.tracker:
+                logging.info(f"Changes this cycle: {self.tracker.counts}")
 
         except Exception as e:
+            self.driver_healthy = not is_driver_crash(e)
             logging.error(f"Main execution error: {str(e)}")
         finally:
-            self.driver.quit()
+            self._close_storage()
+
+    def run(self):
+        if self.metrics_file:
+            metrics.enable()
+        try:
+            self.driver = self.driver_pool.acquire(self.options)
+            try:
+                self._scrape()
+            finally:
+                page_loads = self.fetcher.page_loads if self.fetcher else 0
+                self.driver_pool.release(self.driver, pages=page_loads, healthy=self.driver_healthy)
+                self.driver = None
+        finally:
+            if self.owns_pool:
+                self.driver_pool.close()
+            if self.metrics_file:
+                metrics.export(self.metrics_file)
 
 if __name__ == '__main__':
-    while True:
-        logging.info("Initiating new scraping cycle...")
-        scraper = ZomatoScraper()
-        scraper.run()
-        logging.info("Scraping cycle completed. Next cycle starts in 1 minute.")
-        time.sleep(60)  
\ No newline at end of file
+    # Browsers stay warm between cycles and are recycled after 30 page loads
+    driver_pool = DriverPool(max_pages=30, block_resources=('images', 'fonts', 'analytics'))
+    try:
+        while True:
+            logging.info("Initiating new scraping cycle...")
+            scraper = ZomatoScraper(driver_pool, incremental=True)
+            scraper.run()
+            logging.info(f"Browser pool: {driver_pool.metrics()}")
+            logging.info("Scraping cycle completed. Next cycle starts in 1 minute.")
+            time.sleep(60)
+    finally:
+        driver_pool.close()  
\ No newline at end of file
@@ -0,0 +1,123 @@
+import logging
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+from scraper_core.metrics import metrics
+
+CARD_SELECTOR = "div.sc-1mo3ldo-0.sc-jGkVzM.BXbKf"
+
+# Scrolls to the bottom and resolves as soon as more cards than `previous`
+# exist (watched with a MutationObserver), or after `timeoutMs`.
+WAIT_FOR_NEW_CARDS = """
+const [selector, previous, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const count = () => document.querySelectorAll(selector).length;
+if (count() > previous) {
+    done(count());
+    return;
+}
+let finished = false;
+let timer = null;
+const observer = new MutationObserver(() => {
+    if (count() > previous) finish();
+});
+function finish() {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(count());
+}
+observer.observe(document.body, {childList: true, subtree: true});
+timer = setTimeout(finish, timeoutMs);
+window.scrollTo(0, document.body.scrollHeight);
+"""
+
+CARDS_FROM = "return Array.from(document.querySelectorAll(arguments[0])).slice(arguments[1]);"
+
+# Reads every field of every card from `offset` on in one round trip. Each
+# field spec is a CSS selector (text content) or [selector, attribute].
+CARD_DATA_FROM = """
+const [selector, offset, fields] = arguments;
+return Array.from(document.querySelectorAll(selector)).slice(offset).map(card => {
+    const row = {};
+    for (const [name, spec] of Object.entries(fields)) {
+        const [fieldSelector, attribute] = Array.isArray(spec) ? spec : [spec, null];
+        const element = card.querySelector(fieldSelector);
+        if (!element) {
+            row[name] = null;
+        } else if (attribute) {
+            row[name] = element[attribute] !== undefined ? element[attribute] : element.getAttribute(attribute);
+        } else {
+            row[name] = element.innerText.trim();
+        }
+    }
+    return row;
+});
+"""
+
+
+class LazyLoadScroller:
+    """Scrolls an infinite listing and hands back only the cards appended since the last call.
+
+    Instead of sleeping a fixed time after each scroll, it waits in the page
+    for the card count to grow. The wait is capped by an adaptive timeout of
+    a few times the recent load latency, kept between `min_timeout` and
+    `max_timeout` seconds.
+    """
+
+    def __init__(self, driver, selector=CARD_SELECTOR, min_timeout=0.5, max_timeout=5.0, initial_timeout=2.0):
+        self.driver = driver
+        self.selector = selector
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.latency = initial_timeout / 3
+        self.offset = 0
+        self.started = time.monotonic()
+        self.driver.set_script_timeout(max_timeout + 5)
+
+    @property
+    def timeout(self):
+        return min(self.max_timeout, max(self.min_timeout, 3 * self.latency))
+
+    def _wait_for_more(self):
+        """Return the current card count, scrolling and waiting first if no unseen cards are loaded."""
+        count = self.driver.execute_script("return document.querySelectorAll(arguments[0]).length;", self.selector)
+        if count <= self.offset:
+            started = time.monotonic()
+            try:
+                count = self.driver.execute_async_script(
+                    WAIT_FOR_NEW_CARDS, self.selector, self.offset, int(self.timeout * 1000)
+                )
+            except TimeoutException:
+                count = self.offset
+            waited = time.monotonic() - started
+            metrics.observe('scroll_wait', waited)
+            if count > self.offset:
+                # Exponentially weighted latency of loads that did arrive
+                self.latency = 0.7 * self.latency + 0.3 * waited
+        return count
+
+    def next_cards(self):
+        """Return the card elements added since the previous call."""
+        if self._wait_for_more() <= self.offset:
+            return []
+        with metrics.timer('extract'):
+            cards = self.driver.execute_script(CARDS_FROM, self.selector, self.offset)
+        self.offset += len(cards)
+        return cards
+
+    def next_card_data(self, fields):
+        """Return the fields of every card added since the previous call as dicts, in one script call."""
+        if self._wait_for_more() <= self.offset:
+            return []
+        with metrics.timer('extract'):
+            rows = self.driver.execute_script(CARD_DATA_FROM, self.selector, self.offset, fields)
+        self.offset += len(rows)
+        return rows
+
+    def log_rate(self):
+        elapsed = time.monotonic() - self.started
+        per_card = elapsed / self.offset * 1000 if self.offset else 0
+        logging.info(f"Loaded {self.offset} cards in {elapsed:.1f}s ({per_card:.0f} ms/card).")
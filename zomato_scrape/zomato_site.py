@@ -0,0 +1,167 @@
+"""Zomato as Pipeline sites: the infinite restaurant listing, and restaurant detail pages."""
+import logging
+
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from scraper_core.browser import chromedriver_path
+from scraper_core.normalize import normalizer
+from scraper_core.pipeline import Site
+from scraper_core.sinks import make_sink
+from details import parse_detail_html
+from scrolling import LazyLoadScroller, CARD_SELECTOR
+
+LISTING_URL = "https://www.zomato.com/ncr/restaurants"
+CARD_LINK = "a.sc-hPeUyl.cKQNlu"
+# Present once a detail page has rendered its header
+DETAIL_READY = "h1.sc-7kepeu-0"
+
+# Listing card fields, in output column order
+CARD_FIELDS = {
+    'name': "h4.sc-1hp8d8a-0.sc-Ehqfj.bxOQva",
+    'location': "p.sc-1hez2tp-0.sc-cyQzhP.uIMEk",
+    'rating': "div.sc-1q7bklc-1.cILgox",
+    'cuisine': "p.sc-1hez2tp-0.sc-gggouf.fSxdnq",
+    'price': "p.sc-1hez2tp-0.sc-gggouf.KXcjT",
+}
+
+
+def chrome_options(headless=False):
+    options = webdriver.ChromeOptions()
+    options.add_argument('--start-maximized')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' +
+                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    if headless:
+        options.add_argument('--headless=new')
+    return options
+
+
+def chrome_driver(headless=False):
+    return webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options(headless))
+
+
+def zomato_sink(dataset, storage_backend='csv', types=None, derived=None):
+    """The zomato_data sink both scripts write to, normalized as `dataset` (see scraper_core.normalize)."""
+    if storage_backend == 'csv':
+        return make_sink('csv', 'zomato_data.csv', normalize=normalizer(dataset))
+    return make_sink(storage_backend, f'zomato_data.{storage_backend}',
+                     types=types, derived=derived, normalize=normalizer(dataset))
+
+
+class ListingFetcher:
+    """Fetcher for infinitely scrolling listings, in `driver`.
+
+    Each listing URL is "fetched" once per scroll round: the content handed on
+    is the list of cards appended in that round, as dicts of `fields` (a CSS
+    selector, or (selector, attribute), per field). A listing is done after
+    `max_scroll_attempts` rounds in a row without new cards, or as soon as
+    the pipeline stops asking for more.
+    """
+
+    def __init__(self, driver, fields, bulk_extraction=True, max_scroll_attempts=2, timeout=20):
+        self.driver = driver
+        self.fields = fields
+        self.bulk_extraction = bulk_extraction  # one execute_script call per round for all new cards
+        self.max_scroll_attempts = max_scroll_attempts
+        self.timeout = timeout
+        self.page_loads = 0  # driver.get calls, reported to DriverPool.release
+
+    def _read_cards(self, cards):
+        """Element-by-element fallback for bulk_extraction = False (one WebDriver call per field)."""
+        rows = []
+        for card in cards:
+            try:
+                row = {}
+                for field, spec in self.fields.items():
+                    selector, attribute = spec if isinstance(spec, tuple) else (spec, None)
+                    element = card.find_element(By.CSS_SELECTOR, selector)
+                    row[field] = element.get_attribute(attribute) if attribute else element.text.strip()
+                rows.append(row)
+            except (StaleElementReferenceException, NoSuchElementException) as e:
+                logging.debug(f"Skipping a card due to error: {str(e)}")
+        return rows
+
+    def fetch_all(self, urls):
+        for url in urls:
+            self.page_loads += 1
+            self.driver.get(url)
+            WebDriverWait(self.driver, self.timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, CARD_SELECTOR))
+            )
+            logging.info("Page loaded. Beginning to scroll and extract data...")
+            scroller = LazyLoadScroller(self.driver, CARD_SELECTOR)
+            scroll_attempts = 0
+            try:
+                while scroll_attempts < self.max_scroll_attempts:
+                    # Only cards appended since the last round are read
+                    if self.bulk_extraction:
+                        rows = scroller.next_card_data(self.fields)
+                    else:
+                        rows = self._read_cards(scroller.next_cards())
+                    if not rows:
+                        scroll_attempts += 1
+                        logging.info(f"No new cards loaded. "
+                                     f"Scroll attempt {scroll_attempts}/{self.max_scroll_attempts}")
+                        continue
+                    scroll_attempts = 0
+                    logging.info(f"Found {len(rows)} new restaurant cards on the page.")
+                    yield url, rows
+            finally:
+                scroller.log_rate()
+
+
+class ListingSite(Site):
+    """Cards from a listing, read by a ListingFetcher; cards missing a field are dropped."""
+
+    def __init__(self, listing_url, fields, key_fields):
+        self.listing_url = listing_url
+        self.fields = fields
+        self.key_fields = key_fields
+
+    def urls(self):
+        yield self.listing_url
+
+    def parse(self, url, rows, timings):
+        records = []
+        for row in rows:
+            data = {field: (row.get(field) or '').strip() for field in self.fields}
+            if all(data.values()):
+                records.append(data)
+        return records, True
+
+    def key(self, record):
+        return tuple(record[field] for field in self.key_fields)
+
+
+class DetailSite(Site):
+    """Restaurant detail pages, fetched over HTTP or rendered in a browser.
+
+    Pages that failed or lack some field are kept in `incomplete` instead of
+    being stored, so they can be retried with another fetcher.
+    """
+
+    def __init__(self, urls):
+        self.detail_urls = urls
+        self.incomplete = []
+
+    def urls(self):
+        return iter(self.detail_urls)
+
+    def parse(self, url, content, timings):
+        record, missing = parse_detail_html(content, url)
+        if missing:
+            self.incomplete.append(url)
+            return [], True
+        return [record], True
+
+    def key(self, record):
+        return record['url']
+
+    def page_failed(self, url):
+        self.incomplete.append(url)